@@ -1,8 +1,10 @@
 import logging
 import os
+import re
 import time
 import warnings
 import logging.handlers # Explicitly import the handlers module
+from logger_config import BufferedFileHandler, FastFormatter
 
 # --- Global Cleanup Function ---
 # Function to remove existing log files for a clean run
@@ -39,11 +41,15 @@ file_logger.setLevel(logging.DEBUG) # Set the lowest level for this logger
 file_logger.propagate = False # Prevent messages from being passed to the root logger
 
 # Create a file handler
-file_handler = logging.FileHandler(log_file_name)
+# BufferedFileHandler batches lines into large writes instead of one write() per record.
+# It writes out on a full buffer, after 1 second, or right away for ERROR and above.
+file_handler = BufferedFileHandler(log_file_name)
 file_handler.setLevel(logging.DEBUG) # Set the lowest level for the handler
 
 # Create a formatter and add it to the handler
-formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+# FastFormatter gives the same output as logging.Formatter for this layout, but
+# compiles it once and renders the timestamp only once per second.
+formatter = FastFormatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 file_handler.setFormatter(formatter)
 
 # Add the handler to the logger
@@ -76,7 +82,7 @@ console_handler.setFormatter(formatter) # Reuse the formatter
 dual_log_file_name = "dual_output.log"
 clean_log_files(dual_log_file_name)
 
-dual_file_handler = logging.FileHandler(dual_log_file_name)
+dual_file_handler = BufferedFileHandler(dual_log_file_name)
 dual_file_handler.setLevel(logging.DEBUG) # All levels for file
 dual_file_handler.setFormatter(formatter)
 
@@ -119,8 +125,10 @@ module_logger.setLevel(logging.INFO)
 module_logger.info("Message from a specific module (using __name__).")
 
 # Example of a function using logging
+# Pass the values as arguments instead of using an f-string: the message is then
+# only formatted if the record is actually emitted (DEBUG is disabled here).
 def calculate_something(a, b):
-    module_logger.debug(f"Calculating with a={a}, b={b}")
+    module_logger.debug("Calculating with a=%s, b=%s", a, b)
     if b == 0:
         module_logger.error("Attempted division by zero!")
         return None
@@ -128,7 +136,7 @@ def calculate_something(a, b):
 
 result = calculate_something(20, 5)
 if result is not None:
-    module_logger.info(f"Calculation result: {result}")
+    module_logger.info("Calculation result: %s", result)
 
 calculate_something(15, 0)
 
@@ -154,7 +162,7 @@ rotating_logger.addHandler(rotating_handler)
 
 print("\n--- Testing RotatingFileHandler (check rotating_app.log and its backups) ---")
 for i in range(200): # Write enough messages to trigger rotation
-    rotating_logger.info(f"Rotating log message {i:03d} - " + "A" * 50) # Add some length to messages
+    rotating_logger.info("Rotating log message %03d - %s", i, "A" * 50) # Add some length to messages
     time.sleep(0.01) # Small delay to ensure distinct timestamps
 
 # --- 7. Advanced Scenarios: Timed Log Rotation (TimedRotatingFileHandler) ---
@@ -212,14 +220,21 @@ print("\n--- Testing Custom Log Level (AUDIT) ---")
 custom_level_logger.audit("This is an AUDIT message.")
 custom_level_logger.info("This info message will also show because AUDIT_LEVEL_NUM is higher than INFO.")
 custom_level_logger.debug("This debug message will NOT show as level is AUDIT.")
+# See section 16 for AUDIT as its own durable channel (audit_log.py).
 
 # --- 9. Filters ---
 # Filters provide a more granular way to control which log records get processed by a handler.
 
+IMPORTANT_PATTERN = re.compile("important", re.IGNORECASE)
+
 class ContextFilter(logging.Filter):
     def filter(self, record):
         # Only allow messages if they contain 'important' in the message
-        return 'important' in record.getMessage().lower()
+        # Look at the message template first: most records are decided without
+        # formatting them, and the case-insensitive search avoids a lowercase copy.
+        if IMPORTANT_PATTERN.search(str(record.msg)):
+            return True
+        return bool(record.args) and IMPORTANT_PATTERN.search(record.getMessage()) is not None
 
 filter_logger = logging.getLogger("filter_logger")
 filter_logger.setLevel(logging.INFO)
@@ -239,12 +254,18 @@ filter_logger.warning("Another important warning message.")
 # Used to inject contextual information into log messages.
 
 class CustomAdapter(logging.LoggerAdapter):
+    def __init__(self, logger, extra):
+        super().__init__(logger, extra)
+        # Build the extra dictionary once per adapter, not once per log call
+        self.record_extra = {"user_id": self.extra.get("user_id", "N/A")}
+
     def process(self, msg, kwargs):
         # Add a 'user_id' field to the extra dictionary
         # This will be available in the formatter if you use %(user_id)s
-        if 'extra' not in kwargs:
-            kwargs["extra"] = {}
-        kwargs["extra"]["user_id"] = self.extra.get("user_id", "N/A")
+        if 'extra' in kwargs:
+            kwargs["extra"] = {**kwargs["extra"], **self.record_extra}
+        else:
+            kwargs["extra"] = self.record_extra
         return msg, kwargs
 
 adapter_logger = logging.getLogger("adapter_logger")
@@ -272,14 +293,185 @@ another_user_logger.error("Another user had a critical error.")
 # Direct warnings issued by the `warnings` module to the logging system.
 
 print("\n--- Testing Capturing Warnings ---")
-logging.captureWarnings(True) # Direct warnings to the logging system
+# capture_warnings() works like logging.captureWarnings(), but logs each warning
+# location (category, file, line) only once and then just counts repeats. It logs
+# a "repeated N times" summary every 60 seconds and at exit.
+from warnings_bridge import capture_warnings
+capture_warnings(True) # Direct warnings to the logging system
 
 # Issue a warning using the warnings module
 warnings.warn("This is a warning from the warnings module!", UserWarning)
 warnings.warn("Another warning that should appear in logs.", DeprecationWarning)
 
 # Reset captureWarnings to default (False) if needed
-# logging.captureWarnings(False)
-
+# capture_warnings(False)
+
+# --- 12. Lazy Messages ---
+# LazyLogger skips disabled levels with a single cached lookup and only builds
+# the message when the record is emitted. A callable message is only called then.
+# Change levels through LazyLogger.setLevel() or set_logger_level() so the
+# cached answers are dropped.
+from logger_config import LazyLogger, set_logger_level
+
+print("\n--- Testing LazyLogger ---")
+lazy_logger = LazyLogger(module_logger) # module_logger is at INFO level
+lazy_logger.debug("Never formatted: %s", "expensive value")
+lazy_logger.debug(lambda: "Never built: " + ", ".join(str(i) for i in range(1000)))
+lazy_logger.info(lambda: "Built only because INFO is enabled")
+set_logger_level(module_logger, logging.DEBUG)
+lazy_logger.debug("Emitted now that DEBUG is enabled")
+set_logger_level(module_logger, logging.INFO)
+
+# --- 13. Hybrid Size/Time Rotation with Compression ---
+# One handler that rotates on size OR time, whichever comes first. The emitting
+# thread only renames the file; gzip compression and deleting old backups happen
+# on a background thread.
+from logger_config import HybridRotatingFileHandler, wait_for_rotation_jobs
+
+hybrid_log_file = "hybrid_app.log"
+clean_log_files(hybrid_log_file)
+
+hybrid_logger = logging.getLogger("hybrid_logger")
+hybrid_logger.setLevel(logging.DEBUG)
+hybrid_logger.propagate = False
+
+hybrid_handler = HybridRotatingFileHandler(
+    hybrid_log_file,
+    maxBytes=1024,   # 1 KB ...
+    when='midnight', # ... or midnight, whichever comes first
+    backupCount=3,
+    compress="gzip"
+)
+hybrid_handler.setFormatter(formatter)
+hybrid_logger.addHandler(hybrid_handler)
+
+print("\n--- Testing HybridRotatingFileHandler (check hybrid_app.log.*.gz) ---")
+for i in range(50):
+    hybrid_logger.info("Hybrid log message %03d - %s", i, "B" * 50)
+wait_for_rotation_jobs() # Only so the demo can show the finished .gz files
+
+# --- 14. Rate Limiting, Sampling and Duplicate Suppression ---
+# These filters decide from the message template, before anything is formatted.
+from log_filters import DuplicateBurstFilter, RateLimitFilter, SampleFilter
+
+storm_logger = logging.getLogger("storm_logger")
+storm_logger.setLevel(logging.INFO)
+storm_logger.propagate = False
+
+storm_handler = logging.StreamHandler()
+storm_handler.setFormatter(formatter)
+storm_logger.addHandler(storm_handler)
+
+print("\n--- Testing DuplicateBurstFilter ---")
+burst_filter = DuplicateBurstFilter(window=1.0) # Identical records within 1s are counted, not logged
+storm_logger.addFilter(burst_filter)
+for _ in range(1000):
+    storm_logger.error("Database connection failed: %s", "timeout")
+burst_filter.flush() # Prints "... [repeated 999 times in ...]"
+storm_logger.removeFilter(burst_filter)
+
+print("\n--- Testing SampleFilter (1 in 100) ---")
+sample_filter = SampleFilter(n=100)
+storm_logger.addFilter(sample_filter)
+for i in range(300):
+    storm_logger.info("Processed item %d", i) # Only items 0, 100 and 200 are logged
+storm_logger.removeFilter(sample_filter)
+
+print("\n--- Testing RateLimitFilter (burst of 3) ---")
+rate_filter = RateLimitFilter(rate=1.0, burst=3)
+storm_logger.addFilter(rate_filter)
+for i in range(10):
+    storm_logger.warning("Retrying request %d", i) # Only the first 3 get through
+print(f"Dropped by rate limit: {rate_filter.dropped}")
+storm_logger.removeFilter(rate_filter)
+
+# --- 15. Deduplicating Repeated Exceptions ---
+# A retry loop that fails the same way only renders the full traceback once.
+# Repeats log a fingerprint and a counter instead.
+from log_filters import DedupExceptionFilter
+
+print("\n--- Testing DedupExceptionFilter ---")
+dedup_logger = logging.getLogger("dedup_logger")
+dedup_logger.setLevel(logging.INFO)
+dedup_logger.propagate = False
+dedup_handler = logging.StreamHandler()
+dedup_handler.setFormatter(formatter)
+dedup_logger.addHandler(dedup_handler)
+dedup_logger.addFilter(DedupExceptionFilter(window=60.0))
+
+for attempt in range(3):
+    try:
+        int("not_a_number")
+    except ValueError:
+        dedup_logger.exception("Attempt %d failed to convert string to integer.", attempt)
+
+# --- 16. AUDIT as a Durable Channel ---
+# Audit records get their own append-only, sequence-numbered segment files
+# (audit.log.000001, ...). fsync() is batched across callers (group commit).
+# With durability="record" logger.audit() only returns once the record is on disk.
+from audit_log import find_gaps, get_audit_channel, install_audit_method
+
+print("\n--- Testing the AUDIT channel ---")
+audit_channel = get_audit_channel("audit.log", durability="record")
+install_audit_method(audit_channel) # Replaces the Logger.audit from section 8
+
+seq = custom_level_logger.audit("User %s changed permissions of %s", "user_123", "report.pdf")
+print(f"Audit record {seq} is on disk; missing sequence ranges: {find_gaps('audit.log')}")
+
+# --- 17. Request Context with contextvars ---
+# Instead of one adapter per user, bind the context once per request (asyncio
+# task or thread) and share a single ContextAdapter. Each call reuses the bound
+# dict as `extra`, so nothing is allocated per call.
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from logger_config import ContextAdapter, bind_log_context, log_context, submit_with_log_context
+
+print("\n--- Testing ContextAdapter ---")
+context_logger = ContextAdapter(adapter_logger, user_id="N/A") # Reuses the User:%(user_id)s handler
+
+async def handle_request(user_id):
+    bind_log_context(user_id=user_id) # Only affects this task
+    await asyncio.sleep(0.01)
+    context_logger.info("Request handled.")
+
+async def serve():
+    await asyncio.gather(handle_request("user_123"), handle_request("user_456"))
+
+asyncio.run(serve())
+
+with log_context(user_id="user_789"):
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        # Threads don't inherit contextvars; this helper carries the context over
+        submit_with_log_context(executor, context_logger.warning, "Background job finished.").result()
+context_logger.info("No request context bound here.")
+
+
+# --- 18. Querying the Log File through an Index ---
+# LogIndex keeps a small sidecar index (<file>.idx) of time range, levels and
+# logger names per 64 KB block, so a query only reads the blocks that can match.
+from log_index import query_logs
+
+print("\n--- Querying my_application.log for ERROR records ---")
+for segment_path, offset, text in query_logs(log_file_name, level=logging.ERROR):
+    print(f"{os.path.basename(segment_path)}@{offset}: {text.rstrip()}")
+
+# --- 19. AsyncLogger for asyncio Services ---
+# get_async_logger() calls only queue the record (dropping the oldest queued
+# record if the queue is full), so they never wait for the disk inside the
+# event loop. `await logger.flush()` waits until everything so far is written.
+from logger_config import get_async_logger
+
+print("\n--- Testing AsyncLogger ---")
+async_logger = get_async_logger("async_logger", log_file=log_file_name)
+
+async def handle_async_request(n):
+    async_logger.info("Request %d handled.", n)
+    await asyncio.sleep(0.01)
+
+async def serve_and_shut_down():
+    await asyncio.gather(*(handle_async_request(n) for n in range(3)))
+    await async_logger.flush() # Graceful shutdown: nothing queued is lost
+
+asyncio.run(serve_and_shut_down())
 
 print(f"\nCheck '{log_file_name}', '{dual_log_file_name}', '{rotating_log_file}' (and its backups), and '{timed_rotating_log_file}' for file output.")
@@ -0,0 +1,159 @@
+import logging
+import multiprocessing
+import os
+import time
+
+from logger_config import (
+    LOG_FILE, BufferedFileHandler, FastFormatter, HybridRotatingFileHandler,
+    JsonLinesHandler, _enter_aggregator_mode, get_logger, wait_for_rotation_jobs,
+)
+
+# --- Multi-process logging through one aggregator process ---
+# When several processes open yogesh_debug.log themselves, their rotations race
+# and lines from different processes can interleave half-written. In this mode
+# the worker processes only put records on a multiprocessing.Queue (a pipe).
+# One aggregator process owns the log file and does the rotation, so every
+# line is written whole by a single writer.
+#
+#   aggregator = LogAggregator("batch.log", max_bytes=50 * 1024 * 1024)
+#   aggregator.start()
+#   with multiprocessing.Pool(8, initializer=init_worker_logging,
+#                             initargs=(aggregator.queue,)) as pool:
+#       ...  # workers call get_logger(name) as usual
+#   aggregator.stop()
+
+
+def _build_aggregator_handler(log_file, max_bytes, when, backup_count, compress, json_lines):
+    if json_lines:
+        return JsonLinesHandler(log_file)
+    if max_bytes or backup_count:
+        handler = HybridRotatingFileHandler(log_file, maxBytes=max_bytes, when=when,
+                                            backupCount=backup_count, compress=compress)
+    else:
+        handler = BufferedFileHandler(log_file)
+    handler.setFormatter(FastFormatter())
+    return handler
+
+
+def _aggregator_main(log_queue, handler_options, console):
+    # Runs in the aggregator process: the only place the log file is opened
+    handlers = [_build_aggregator_handler(**handler_options)]
+    if console:
+        console_handler = logging.StreamHandler()
+        console_handler.setFormatter(FastFormatter())
+        handlers.append(console_handler)
+    while True:
+        record = log_queue.get()
+        if record is None: # Sentinel from LogAggregator.stop()
+            break
+        for handler in handlers:
+            if record.levelno >= handler.level:
+                handler.handle(record)
+    wait_for_rotation_jobs()
+    for handler in handlers:
+        handler.close()
+
+
+class LogAggregator:
+    """Owns the log file in a separate process and writes records sent by workers.
+
+    `max_bytes`/`when`/`backup_count`/`compress` turn on HybridRotatingFileHandler
+    rotation in the aggregator; otherwise a BufferedFileHandler is used.
+    """
+
+    def __init__(self, log_file=LOG_FILE, max_bytes=0, when='midnight', backup_count=0,
+                 compress="gzip", json_lines=False, console=False, context=None):
+        self._context = context or multiprocessing.get_context()
+        self.queue = self._context.Queue()
+        self._handler_options = {
+            "log_file": os.path.abspath(log_file),
+            "max_bytes": max_bytes,
+            "when": when,
+            "backup_count": backup_count,
+            "compress": compress,
+            "json_lines": json_lines,
+        }
+        self._console = console
+        self._process = None
+
+    def start(self):
+        _enter_aggregator_mode() # Processes forked from here on start with an empty logger registry
+        self._process = self._context.Process(
+            target=_aggregator_main,
+            args=(self.queue, self._handler_options, self._console),
+            name="log-aggregator",
+            daemon=True,
+        )
+        self._process.start()
+        return self
+
+    def stop(self):
+        """Writes out everything already sent and stops the aggregator process."""
+        if self._process is None:
+            return
+        self.queue.put(None)
+        self._process.join()
+        self._process = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+_worker_queue = None
+
+
+def init_worker_logging(log_queue):
+    """Pool initializer: makes get_worker_logger() in this process send to `log_queue`."""
+    global _worker_queue
+    _worker_queue = log_queue
+
+
+def get_worker_logger(name):
+    """get_logger(name) wired to the aggregator queue set by init_worker_logging()."""
+    if _worker_queue is None:
+        raise RuntimeError("init_worker_logging() was not called in this process")
+    return get_logger(name, aggregator_queue=_worker_queue)
+
+
+# --- Throughput check ---
+
+def _throughput_worker(log_queue, worker_id, records):
+    init_worker_logging(log_queue)
+    logger = get_worker_logger(f"worker-{worker_id}")
+    logger.propagate = False
+    for i in range(records):
+        logger.info("worker %d record %d payload %s", worker_id, i, "x" * 40)
+
+
+def measure_throughput(workers, records_per_worker, log_file="aggregator_throughput.log"):
+    """Runs `workers` processes through one aggregator and returns records/second.
+
+    Also checks that every record arrived as one complete line.
+    """
+    if os.path.exists(log_file):
+        os.remove(log_file)
+    context = multiprocessing.get_context()
+    aggregator = LogAggregator(log_file, context=context).start()
+    started = time.perf_counter()
+    processes = [
+        context.Process(target=_throughput_worker, args=(aggregator.queue, worker_id, records_per_worker))
+        for worker_id in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    aggregator.stop()
+    elapsed = time.perf_counter() - started
+
+    with open(log_file) as f:
+        lines = f.read().splitlines()
+    expected = workers * records_per_worker
+    complete = sum(1 for line in lines if line.endswith("x" * 40))
+    if len(lines) != expected or complete != expected:
+        raise AssertionError(f"Expected {expected} complete lines, found {complete} of {len(lines)}")
+    os.remove(log_file)
+    return expected / elapsed
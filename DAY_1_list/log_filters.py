@@ -0,0 +1,229 @@
+import collections
+import hashlib
+import logging
+import threading
+import time
+
+# --- Cheap filters for log storms ---
+# All of these decide from the record's name, level, call site and message
+# *template* (record.msg), so a record that gets dropped is never formatted.
+# They work attached to a logger or to a handler.
+
+DEFAULT_MAX_KEYS = 10000 # Cap on remembered templates, so unique messages can't grow memory forever
+
+
+def _template(record):
+    # record.msg as a dict key; any object can be logged, hashable or not
+    return record.msg if isinstance(record.msg, str) else repr(record.msg)
+
+
+class RateLimitFilter(logging.Filter):
+    """Token bucket per logger name: `rate` records per second, bursts up to `burst`."""
+
+    def __init__(self, rate=10.0, burst=20):
+        super().__init__()
+        self.rate = rate
+        self.burst = burst
+        self.dropped = 0
+        self._buckets = {} # logger name -> [tokens, last refill time]
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(record.name)
+            if bucket is None:
+                bucket = self._buckets[record.name] = [self.burst, now]
+            else:
+                bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+                bucket[1] = now
+            if bucket[0] >= 1:
+                bucket[0] -= 1
+                return True
+            self.dropped += 1
+            return False
+
+
+class SampleFilter(logging.Filter):
+    """Lets through the 1st, (n+1)th, (2n+1)th, ... record of each message template.
+
+    Records at `always_level` or above are never sampled out.
+    """
+
+    def __init__(self, n=10, always_level=logging.WARNING, max_keys=DEFAULT_MAX_KEYS):
+        super().__init__()
+        self.n = n
+        self.always_level = always_level
+        self.max_keys = max_keys
+        self.dropped = 0
+        self._counts = {} # (logger name, template) -> records seen
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if record.levelno >= self.always_level:
+            return True
+        key = (record.name, _template(record))
+        with self._lock:
+            count = self._counts.get(key, 0)
+            if count == 0 and len(self._counts) >= self.max_keys:
+                self._counts.clear()
+            self._counts[key] = count + 1
+            if count % self.n == 0:
+                return True
+            self.dropped += 1
+            return False
+
+
+class DuplicateBurstFilter(logging.Filter):
+    """Suppresses repeats of the same call site and template within `window` seconds.
+
+    The first record of a burst passes. When the burst is over, one summary
+    record ("... [repeated N times in X.Xs]") is sent through the originating
+    logger, or, when the filter is attached to handlers, to those handlers
+    only. Pending summaries are sent on the next record that reaches the
+    filter after the window, or by calling flush().
+    """
+
+    def __init__(self, window=1.0, max_keys=DEFAULT_MAX_KEYS):
+        super().__init__()
+        self.window = window
+        self.max_keys = max_keys
+        self._bursts = {} # key -> [first record, first seen, repeats]
+        self._next_sweep = 0.0
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if getattr(record, "burst_summary", False):
+            return True
+        now = time.monotonic()
+        key = (record.name, record.levelno, record.pathname, record.lineno, _template(record))
+        with self._lock:
+            expired = self._sweep(now) if now >= self._next_sweep else []
+            burst = self._bursts.get(key)
+            if burst is None:
+                if len(self._bursts) >= self.max_keys:
+                    expired.extend(self._take_all())
+                self._bursts[key] = [record, now, 0]
+                passed = True
+            else:
+                burst[2] += 1
+                passed = False
+        # Summaries are emitted outside the lock; they come back through filter()
+        for summary in expired:
+            self._emit(summary)
+        return passed
+
+    def flush(self):
+        """Sends the summaries of every burst still being counted."""
+        with self._lock:
+            summaries = self._take_all()
+        for summary in summaries:
+            self._emit(summary)
+
+    def _emit(self, summary):
+        logger = logging.getLogger(summary.name)
+        if self in logger.filters:
+            logger.handle(summary)
+            return
+        # Attached to handlers: the summary goes to those only, not to the
+        # other handlers of the logger
+        owners = []
+        current = logger
+        while current is not None:
+            owners.extend(handler for handler in current.handlers if self in handler.filters)
+            current = current.parent if current.propagate else None
+        if not owners:
+            # A handler outside the logger tree (e.g. behind a QueueListener)
+            logger.handle(summary)
+        for handler in owners:
+            if summary.levelno >= handler.level:
+                handler.handle(summary)
+
+    def _sweep(self, now):
+        # Caller holds self._lock. Ends bursts whose window has passed.
+        self._next_sweep = now + self.window
+        summaries = []
+        for key, (first, started, repeats) in list(self._bursts.items()):
+            if now - started >= self.window:
+                del self._bursts[key]
+                if repeats:
+                    summaries.append(self._summary(first, repeats, now - started))
+        return summaries
+
+    def _take_all(self):
+        # Caller holds self._lock
+        now = time.monotonic()
+        summaries = [
+            self._summary(first, repeats, now - started)
+            for first, started, repeats in self._bursts.values() if repeats
+        ]
+        self._bursts.clear()
+        return summaries
+
+    @staticmethod
+    def _summary(first, repeats, elapsed):
+        summary = logging.makeLogRecord(first.__dict__)
+        summary.msg = "%s [repeated %d times in %.1fs]"
+        summary.args = (first.getMessage(), repeats, elapsed)
+        summary.exc_info = summary.exc_text = summary.stack_info = None
+        summary.created = time.time()
+        summary.msecs = (summary.created - int(summary.created)) * 1000
+        summary.burst_summary = True
+        return summary
+
+
+class DedupExceptionFilter(logging.Filter):
+    """Renders the traceback of a repeated exception only once per `window` seconds.
+
+    Exceptions are fingerprinted by exception type plus the (file, function,
+    line) of every traceback frame, which needs no source lookup or text
+    rendering. The first occurrence keeps its traceback and gets a
+    "[exc <fingerprint>]" tag. Repeats inside the window lose exc_info and get
+    "[exc <fingerprint> seen N times, traceback omitted]" instead. The
+    `max_fingerprints` most recently seen fingerprints are remembered (LRU).
+    """
+
+    def __init__(self, window=60.0, max_fingerprints=1024):
+        super().__init__()
+        self.window = window
+        self.max_fingerprints = max_fingerprints
+        self._seen = collections.OrderedDict() # location key -> [fingerprint, first seen, count]
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _location_key(exc_type, tb):
+        frames = []
+        while tb is not None:
+            code = tb.tb_frame.f_code
+            frames.append((code.co_filename, code.co_name, tb.tb_lineno))
+            tb = tb.tb_next
+        return (exc_type.__module__, exc_type.__qualname__, tuple(frames))
+
+    def filter(self, record):
+        exc_info = record.exc_info
+        if not exc_info or exc_info[0] is None:
+            return True
+        key = self._location_key(exc_info[0], exc_info[2])
+        now = time.monotonic()
+        with self._lock:
+            entry = self._seen.get(key)
+            if entry is None or now - entry[1] >= self.window:
+                # Stable across processes and runs, unlike hash()
+                fingerprint = hashlib.blake2b(repr(key).encode(), digest_size=6).hexdigest()
+                entry = self._seen[key] = [fingerprint, now, 1]
+                if len(self._seen) > self.max_fingerprints:
+                    self._seen.popitem(last=False)
+                repeat = False
+            else:
+                entry[2] += 1
+                repeat = True
+            self._seen.move_to_end(key)
+            fingerprint, count = entry[0], entry[2]
+        record.exc_fingerprint = fingerprint
+        if repeat:
+            record.exc_info = None
+            record.exc_text = None
+            record.msg = f"{record.msg} [exc {fingerprint} seen {count} times, traceback omitted]"
+        else:
+            record.msg = f"{record.msg} [exc {fingerprint}]"
+        return True
@@ -0,0 +1,255 @@
+import json
+import logging
+import mmap
+import os
+import re
+import struct
+import time
+
+from logger_config import LOG_FILE
+
+# --- On-disk index for LOG_FORMAT log files ---
+# Searching 50 GB of logs with grep reads all 50 GB. LogIndex cuts a log file
+# into blocks of about BLOCK_SIZE bytes, always starting at a record. For each
+# block it stores a sidecar entry:
+#   start offset | first and last timestamp | level bitmap | logger name bitmap
+# A query such as "ERRORs from logger X between T1 and T2" first picks the
+# blocks whose time range overlaps and whose bitmaps contain the level and the
+# name. Only those byte ranges of the memory-mapped file are then parsed.
+#
+# The index is incremental: update() only reads bytes appended since the last
+# call, so it can follow a file while it is being written. To index segments
+# as they are rotated, pass on_rotate=index_segment to HybridRotatingFileHandler
+# together with compress=None: compressed segments can't be memory-mapped.
+
+BLOCK_SIZE = 64 * 1024
+_READ_CHUNK = 16 * 1024 * 1024 # update() reads big files in pieces this size
+
+# One index entry: offset, first time, last time, level bits, name bits
+_ENTRY = struct.Struct("<QddHQ")
+
+_OTHER_LEVEL_BIT = 15 # Levels that logging.getLevelName() does not know
+_OTHER_NAME_BIT = 63  # Every logger name after the first 63 shares this bit
+_MAX_NAME_BITS = 63
+
+# "2026-10-17 06:08:47,237 - name - LEVEL - message"
+_HEADER = re.compile(rb"(\d{4}-\d{2}-\d{2} \d{2}:\d{2}):(\d{2}),(\d{3}) - (.*?) - ([A-Z]+) - ")
+
+
+def _level_bit(levelname):
+    level = logging.getLevelName(levelname)
+    if not isinstance(level, int):
+        return _OTHER_LEVEL_BIT
+    return min(level // 10, _OTHER_LEVEL_BIT - 1)
+
+
+def _levels_mask(min_level):
+    # Bits of every level >= min_level, plus unknown levels (checked exactly later)
+    first = min(min_level // 10, _OTHER_LEVEL_BIT - 1)
+    mask = 1 << _OTHER_LEVEL_BIT
+    for bit in range(first, _OTHER_LEVEL_BIT):
+        mask |= 1 << bit
+    return mask
+
+
+class _TimestampParser:
+    # time.mktime() per line is slow; cache the epoch of each "YYYY-mm-dd HH:MM"
+    def __init__(self):
+        self._minutes = {}
+
+    def parse(self, minute, seconds, millis):
+        base = self._minutes.get(minute)
+        if base is None:
+            base = self._minutes[minute] = time.mktime(time.strptime(minute.decode(), "%Y-%m-%d %H:%M"))
+        return base + int(seconds) + int(millis) / 1000
+
+
+class LogIndex:
+    """Sparse time/level/logger-name index for one log file, kept in <file>.idx(.json)."""
+
+    def __init__(self, path=LOG_FILE, block_size=BLOCK_SIZE):
+        self.path = os.path.abspath(path)
+        self.block_size = block_size
+        self._parser = _TimestampParser()
+        self._load()
+
+    # --- Building ---
+
+    def _load(self):
+        self.names = {}        # logger name -> bit
+        self.entries = []      # [offset, first time, last time, level bits, name bits]
+        self.indexed_size = 0  # bytes of the log file covered by the index
+        try:
+            with open(self.path + ".idx.json") as f:
+                meta = json.load(f)
+            with open(self.path + ".idx", "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return
+        if meta["file_id"] != self._file_id():
+            return # The file was rotated away or replaced since; start over
+        self.names = meta["names"]
+        self.indexed_size = meta["indexed_size"]
+        self.entries = [list(entry) for entry in _ENTRY.iter_unpack(data)]
+
+    def _file_id(self):
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return [st.st_dev, st.st_ino]
+
+    def _save(self):
+        with open(self.path + ".idx.tmp", "wb") as f:
+            for entry in self.entries:
+                f.write(_ENTRY.pack(*entry))
+        with open(self.path + ".idx.json.tmp", "w") as f:
+            json.dump({"file_id": self._file_id(), "names": self.names,
+                       "indexed_size": self.indexed_size}, f)
+        os.replace(self.path + ".idx.tmp", self.path + ".idx")
+        os.replace(self.path + ".idx.json.tmp", self.path + ".idx.json")
+
+    def _name_bit(self, name):
+        bit = self.names.get(name)
+        if bit is None:
+            bit = len(self.names) if len(self.names) < _MAX_NAME_BITS else _OTHER_NAME_BIT
+            if bit != _OTHER_NAME_BIT:
+                self.names[name] = bit
+        return bit
+
+    def update(self):
+        """Indexes whatever was appended to the log file since the last update()."""
+        if not os.path.exists(self.path):
+            return self
+        size = os.path.getsize(self.path)
+        if size <= self.indexed_size:
+            return self
+        # Re-open the last (possibly partial) block so it keeps growing to block_size
+        entry = self.entries.pop() if self.entries else None
+        offset = entry[0] if entry else 0
+        with open(self.path, "rb") as f:
+            f.seek(offset)
+            while offset < size:
+                data = f.read(min(_READ_CHUNK, size - offset))
+                end = data.rfind(b"\n") + 1 # Only index complete lines
+                if end == 0:
+                    break
+                f.seek(offset + end)
+                entry = self._index_chunk(data, end, offset, entry)
+                offset += end
+        if entry is not None:
+            self.entries.append(entry)
+        self.indexed_size = offset
+        self._save()
+        return self
+
+    def _index_chunk(self, data, end, offset, entry):
+        position = 0
+        while position < end:
+            newline = data.index(b"\n", position) + 1
+            line_start = offset + position
+            header = _HEADER.match(data, position, newline)
+            position = newline
+            if header is None:
+                continue # Continuation line (traceback etc.) of the previous record
+            created = self._parser.parse(header.group(1), header.group(2), header.group(3))
+            level_bit = 1 << _level_bit(header.group(5).decode())
+            name_bit = 1 << self._name_bit(header.group(4).decode(errors="replace"))
+            if entry is None or line_start - entry[0] >= self.block_size:
+                if entry is not None:
+                    self.entries.append(entry)
+                entry = [line_start, created, created, 0, 0]
+            entry[1] = min(entry[1], created)
+            entry[2] = max(entry[2], created)
+            entry[3] |= level_bit
+            entry[4] |= name_bit
+        return entry
+
+    # --- Querying ---
+
+    def _candidate_ranges(self, level_mask, name_mask, start, end):
+        ranges = []
+        for i, (offset, first, last, levels, names) in enumerate(self.entries):
+            if last < start or first > end or not levels & level_mask or not names & name_mask:
+                continue
+            stop = self.entries[i + 1][0] if i + 1 < len(self.entries) else self.indexed_size
+            if ranges and ranges[-1][1] == offset:
+                ranges[-1][1] = stop # Merge neighbouring blocks into one scan
+            else:
+                ranges.append([offset, stop])
+        return ranges
+
+    def query(self, level=logging.NOTSET, name=None, start=None, end=None):
+        """Yields (offset, record text) for records at `level` or above from logger
+        `name` (None = any) with start <= time <= end (epoch seconds, None = open).
+
+        Record text includes continuation lines such as tracebacks.
+        """
+        self.update()
+        if isinstance(level, str):
+            level = logging.getLevelName(level)
+        start = float("-inf") if start is None else start
+        end = float("inf") if end is None else end
+        level_mask = _levels_mask(level)
+        if name is None:
+            name_mask = (1 << 64) - 1
+        else:
+            name_mask = 1 << self.names.get(name, _OTHER_NAME_BIT)
+        ranges = self._candidate_ranges(level_mask, name_mask, start, end)
+        if not ranges:
+            return
+        name_bytes = None if name is None else name.encode()
+        with open(self.path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            for range_start, range_end in ranges:
+                yield from self._scan(mm, range_start, range_end, level, name_bytes, start, end)
+
+    def _scan(self, mm, position, range_end, level, name, start, end):
+        record_start = None # Offset of the matching record being collected
+        while position < range_end:
+            newline = mm.find(b"\n", position, self.indexed_size)
+            newline = self.indexed_size if newline < 0 else newline + 1
+            header = _HEADER.match(mm, position, newline)
+            if header is not None:
+                if record_start is not None:
+                    yield record_start, mm[record_start:position].decode(errors="replace")
+                    record_start = None
+                if self._matches(header, level, name, start, end):
+                    record_start = position
+            position = newline
+        # A matching record may continue past the end of the range
+        if record_start is not None:
+            while position < self.indexed_size:
+                newline = mm.find(b"\n", position, self.indexed_size)
+                newline = self.indexed_size if newline < 0 else newline + 1
+                if _HEADER.match(mm, position, newline):
+                    break
+                position = newline
+            yield record_start, mm[record_start:position].decode(errors="replace")
+
+    def _matches(self, header, level, name, start, end):
+        if name is not None and header.group(4) != name:
+            return False
+        record_level = logging.getLevelName(header.group(5).decode())
+        if isinstance(record_level, int) and record_level < level:
+            return False
+        created = self._parser.parse(header.group(1), header.group(2), header.group(3))
+        return start <= created <= end
+
+
+def index_segment(path):
+    """Builds the index of a rotated segment (HybridRotatingFileHandler on_rotate hook)."""
+    LogIndex(path).update()
+
+
+def query_logs(path=LOG_FILE, level=logging.NOTSET, name=None, start=None, end=None):
+    """LogIndex.query() over `path` and its uncompressed rotated segments, oldest first."""
+    directory, base = os.path.split(os.path.abspath(path))
+    segment_pattern = re.compile(re.escape(base) + r"\.\d{4}-\d{2}-\d{2}_\d{2}-\d{2}-\d{2}(?:\.\d+)?$")
+    segments = sorted(
+        (name_ for name_ in os.listdir(directory) if segment_pattern.match(name_)),
+        key=lambda name_: [int(part) if part.isdigit() else part for part in name_[len(base):].split(".")],
+    )
+    for segment in segments + [base]:
+        segment_path = os.path.join(directory, segment)
+        for offset, text in LogIndex(segment_path).query(level, name, start, end):
+            yield segment_path, offset, text
@@ -1,20 +1,1298 @@
+import asyncio
+import atexit
+import bz2
+import contextlib
+import contextvars
+import copy
+import gzip
+import itertools
+import json
 import logging
+import logging.handlers
+import lzma
+import math
+import operator
+import os
+import queue
+import re
+import shutil
+import struct
+import threading
+import time
+import traceback
+import weakref
 
-def get_logger(name):
-    logger = logging.getLogger(name)
-    logger.setLevel(logging.DEBUG)
+from log_filters import DedupExceptionFilter
 
-    fileHandlers = logging.FileHandler("yogesh_debug.log")
-    conslove_handler = logging.StreamHandler()
+LOG_FILE = "yogesh_debug.log"
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 
-    formatters = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+# --- Queue-backed (non-blocking) mode ---
+# In queue mode the logger only puts records on an in-memory queue. A
+# background QueueListener thread owns the real file/console handlers, so the
+# formatting and the disk write happen off the caller's thread.
 
-    fileHandlers.setFormatter(formatters)
-    conslove_handler.setFormatter(formatters)
+# What to do when the bounded queue is full
+OVERFLOW_BLOCK = "block"                 # wait for the writer to make room
+OVERFLOW_DROP_OLDEST = "drop-oldest"     # throw away the oldest queued record
+OVERFLOW_DROP_DEBUG = "drop-debug-first" # throw away a queued DEBUG record first
+OVERFLOW_POLICIES = (OVERFLOW_BLOCK, OVERFLOW_DROP_OLDEST, OVERFLOW_DROP_DEBUG)
 
-    logger.addHandler(fileHandlers)
-    logger.addHandler(conslove_handler)
+DEFAULT_QUEUE_SIZE = 10000
+
+
+class BoundedQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler for a bounded queue that applies an overflow policy when full."""
+
+    def __init__(self, log_queue, overflow=OVERFLOW_BLOCK):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy: {overflow!r}")
+        super().__init__(log_queue)
+        self.overflow = overflow
+        self.dropped = 0 # Number of records lost because the queue was full
+
+    def prepare(self, record):
+        # The stock prepare() renders the traceback on the caller's thread. Our
+        # queue never leaves the process, so keep exc_info on the record and
+        # let the writer thread's formatter render it. Only the message args
+        # are merged here, since they may be mutated after the call returns.
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        return record
+
+    def enqueue(self, record):
+        if self.overflow == OVERFLOW_BLOCK:
+            self.queue.put(record)
+            return
+        while True:
+            try:
+                self.queue.put_nowait(record)
+                return
+            except queue.Full:
+                if not self._make_room(record):
+                    self.dropped += 1
+                    return
+
+    def _make_room(self, record):
+        # Removes one queued record to make space for `record`.
+        # Returns False if `record` itself should be dropped instead.
+        q = self.queue
+        with q.mutex:
+            if not q.queue:
+                return True # The writer emptied the queue meanwhile, just retry
+            victim = self._pick_victim(q.queue, record)
+            if victim is None:
+                return False
+            if victim is q.queue[0]:
+                q.queue.popleft()
+            else:
+                q.queue.remove(victim)
+            # Keep queue.join() / task_done() accounting correct
+            q.unfinished_tasks -= 1
+            q.not_full.notify()
+        self.dropped += 1
+        return True
+
+    def _pick_victim(self, queued_records, record):
+        oldest = None
+        for queued in queued_records:
+            if isinstance(queued, _FlushRequest):
+                continue # Someone is waiting on it; never dropped
+            if self.overflow != OVERFLOW_DROP_DEBUG or queued.levelno <= logging.DEBUG:
+                return queued
+            if oldest is None:
+                oldest = queued
+        # drop-debug-first and no DEBUG record is queued
+        if record.levelno <= logging.DEBUG:
+            return None # Nothing less important than the new record
+        return oldest
+
+    def request_flush(self, callback):
+        """Asks the writer thread to flush its handlers once it has written
+        everything queued so far, then to call `callback()` (on that thread).
+
+        Never blocks and is never dropped, even when the queue is full.
+        """
+        q = self.queue
+        with q.mutex:
+            q.queue.append(_FlushRequest(callback))
+            q.unfinished_tasks += 1
+            q.not_empty.notify()
+
+
+class _FlushRequest:
+    # Queued behind the records it covers; handled by FlushingQueueListener
+    __slots__ = ("callback",)
+
+    def __init__(self, callback):
+        self.callback = callback
+
+
+class _BlockingSentinelListener(logging.handlers.QueueListener):
+    # The stock listener uses put_nowait() for its stop sentinel, which fails
+    # when a bounded queue is full. Wait for room instead so stop() always drains.
+    def enqueue_sentinel(self):
+        self.queue.put(self._sentinel)
+
+
+class FlushingQueueListener(_BlockingSentinelListener):
+    """QueueListener that also serves BoundedQueueHandler.request_flush()."""
+
+    def handle(self, record):
+        if isinstance(record, _FlushRequest):
+            for handler in self.handlers:
+                handler.flush()
+            record.callback()
+            return
+        super().handle(record)
+
+
+# --- Fast formatter ---
+# logging.Formatter re-reads the whole record __dict__ through the format string
+# and calls time.strftime() for every record. FastFormatter compiles a plain
+# "%(field)s" layout once into a positional template plus one itemgetter, and
+# renders asctime once per second.
+
+class FastFormatter(logging.Formatter):
+    """Drop-in Formatter for "%(field)s"-only layouts such as LOG_FORMAT.
+
+    Output is identical to logging.Formatter with the same arguments. Layouts
+    that use anything else (padding, %(msecs)03d, {}-style, ...) fall back to
+    the stock implementation.
+    """
+
+    def __init__(self, fmt=LOG_FORMAT, datefmt=None, style='%', validate=True):
+        super().__init__(fmt, datefmt, style, validate)
+        self._template = None
+        fmt = self._fmt
+        if style == '%' and '%' not in re.sub(r"%\(\w+\)s|%%", "", fmt):
+            fields = re.findall(r"%\((\w+)\)s", fmt)
+            self._template = re.sub(r"%\(\w+\)s", "%s", fmt)
+            if len(fields) == 1:
+                getter = operator.itemgetter(fields[0])
+                self._getter = lambda d: (getter(d),)
+            else:
+                self._getter = operator.itemgetter(*fields)
+        self._uses_asctime = '%(asctime)' in fmt
+        self._cached_time = (None, None) # (second, asctime text), swapped as one object
+
+    def formatTime(self, record, datefmt=None):
+        if datefmt is not None: # Only the default layout is cached
+            return super().formatTime(record, datefmt)
+        second = int(record.created)
+        cached_second, cached = self._cached_time
+        if cached_second != second:
+            cached = time.strftime(self.default_time_format, self.converter(record.created))
+            # One tuple, so a thread never sees one second's text under another
+            self._cached_time = (second, cached)
+        if self.default_msec_format:
+            return self.default_msec_format % (cached, record.msecs)
+        return cached
+
+    def format(self, record):
+        if self._template is None:
+            return super().format(record)
+        record.message = record.getMessage()
+        if self._uses_asctime:
+            record.asctime = self.formatTime(record, self.datefmt)
+        try:
+            s = self._template % self._getter(record.__dict__)
+        except KeyError as e:
+            raise ValueError('Formatting field not found in record: %s' % e)
+        if record.exc_info:
+            # Cache the traceback text to avoid converting it multiple times
+            if not record.exc_text:
+                record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            if s[-1:] != "\n":
+                s = s + "\n"
+            s = s + record.exc_text
+        if record.stack_info:
+            if s[-1:] != "\n":
+                s = s + "\n"
+            s = s + self.formatStack(record.stack_info)
+        return s
+
+
+# --- Buffered file writer ---
+# logging.FileHandler writes (and flushes) once per record. With millions of
+# DEBUG lines that is millions of write() syscalls. BufferedFileHandler keeps
+# the encoded lines in a byte buffer and writes them out in large chunks.
+
+DEFAULT_BUFFER_SIZE = 64 * 1024 # bytes
+DEFAULT_FLUSH_INTERVAL = 1.0    # seconds
+
+
+class BufferedFileHandler(logging.FileHandler):
+    """FileHandler that batches formatted records into large writes.
+
+    The buffer is written out when it reaches `buffer_size` bytes, when
+    `flush_interval` seconds have passed since the last write, or as soon as
+    a record at `flush_level` or above arrives.
+    """
+
+    def __init__(self, filename, mode='a', encoding=None, delay=False,
+                 buffer_size=DEFAULT_BUFFER_SIZE, flush_interval=DEFAULT_FLUSH_INTERVAL,
+                 flush_level=logging.ERROR):
+        self.buffer_size = buffer_size
+        self.flush_interval = flush_interval
+        self.flush_level = flush_level
+        self._buffer = bytearray()
+        self._last_write = time.monotonic()
+        super().__init__(filename, mode, encoding or 'utf-8', delay)
+        self._stop_flusher = threading.Event()
+        self._start_flusher()
+        _buffered_handlers.add(self)
+
+    def _start_flusher(self):
+        # Writes out a quiet buffer even if no new record comes in to trigger it
+        if self.flush_interval and not self._stop_flusher.is_set():
+            threading.Thread(target=self._flush_periodically, daemon=True,
+                             name=f"log-flusher-{os.path.basename(self.baseFilename)}").start()
+
+    def _after_fork_in_child(self):
+        # The parent writes what it had buffered; the child has no flusher thread yet
+        self._buffer.clear()
+        self._last_write = time.monotonic()
+        self._start_flusher()
+
+    def _open(self):
+        # Unbuffered binary file: every chunk we hand over is exactly one write()
+        mode = self.mode if 'b' in self.mode else self.mode + 'b'
+        return open(self.baseFilename, mode, buffering=0)
+
+    def emit(self, record):
+        try:
+            self._append(record)
+            if (len(self._buffer) >= self.buffer_size
+                    or record.levelno >= self.flush_level
+                    or time.monotonic() - self._last_write >= self.flush_interval):
+                self._write_buffer()
+        except RecursionError:
+            raise
+        except Exception:
+            self.handleError(record)
+
+    def _append(self, record):
+        # Caller must hold self.lock
+        self._buffer += (self.format(record) + self.terminator).encode(self.encoding, self.errors or 'strict')
+
+    def _write_buffer(self):
+        # Caller must hold self.lock
+        self._last_write = time.monotonic()
+        if not self._buffer:
+            return
+        if self.stream is None:
+            self.stream = self._open()
+        view = memoryview(self._buffer)
+        while view:
+            written = self.stream.write(view)
+            view = view[written:]
+        view.release()
+        self._buffer.clear()
+
+    def _flush_periodically(self):
+        while not self._stop_flusher.wait(self.flush_interval):
+            if time.monotonic() - self._last_write >= self.flush_interval:
+                self.flush()
+
+    def flush(self):
+        with self.lock:
+            if not self._closed:
+                self._write_buffer()
+
+    def close(self):
+        self._stop_flusher.set()
+        with self.lock:
+            if not self._closed:
+                self._write_buffer()
+            super().close()
+
+
+_buffered_handlers = weakref.WeakSet() # every BufferedFileHandler, for the fork hook
+
+
+def _reset_buffers_after_fork():
+    for handler in list(_buffered_handlers):
+        handler._after_fork_in_child()
+
+
+# logging registered its own hook first, so the handler locks are already
+# reinitialized when this one runs
+os.register_at_fork(after_in_child=_reset_buffers_after_fork)
+
+
+# --- Hybrid size/time rotation with background compression ---
+# RotatingFileHandler rotates on size, TimedRotatingFileHandler on time, and
+# both rename/delete backups on the logging thread. HybridRotatingFileHandler
+# rolls over on whichever limit is hit first. On the emitting thread it only
+# renames the file to a timestamped segment, which costs the same for any file
+# size. Compressing the segment and deleting old backups is left to a
+# background worker thread.
+
+# compress= name -> (open function, file extension). zstd is not in the
+# standard library, so the choices are the stdlib codecs.
+COMPRESSORS = {
+    "gzip": (gzip.open, ".gz"),
+    "bz2": (bz2.open, ".bz2"),
+    "lzma": (lzma.open, ".xz"),
+}
+
+_SEGMENT_TIME_FORMAT = "%Y-%m-%d_%H-%M-%S"
+
+_rotation_jobs = queue.Queue()
+_rotation_worker = None
+_rotation_worker_lock = threading.Lock()
+
+
+def _run_rotation_jobs():
+    while True:
+        job = _rotation_jobs.get()
+        try:
+            job()
+        except Exception:
+            # Nowhere sensible to log to from here; don't let one bad segment
+            # kill the worker for every other handler.
+            traceback.print_exc()
+        finally:
+            _rotation_jobs.task_done()
+
+
+def _submit_rotation_job(job):
+    global _rotation_worker
+    with _rotation_worker_lock:
+        if _rotation_worker is None:
+            _rotation_worker = threading.Thread(target=_run_rotation_jobs, daemon=True,
+                                                name="log-rotation-worker")
+            _rotation_worker.start()
+    _rotation_jobs.put(job)
+
+
+def wait_for_rotation_jobs():
+    """Blocks until every queued segment has been compressed and pruned."""
+    _rotation_jobs.join()
+
+
+class HybridRotatingFileHandler(logging.handlers.TimedRotatingFileHandler):
+    """Rotates when the file reaches `maxBytes` or when the `when`/`interval`
+    period ends, whichever comes first.
+
+    Rotated segments are named <file>.<YYYY-mm-dd_HH-MM-SS>[.<n>] and then
+    compressed (`compress` is a key of COMPRESSORS, or None) and pruned to
+    `backupCount` segments by a background worker. `on_rotate(segment_path)`,
+    if given, runs on that worker before compression (e.g. log_index.index_segment).
+    """
+
+    def __init__(self, filename, maxBytes=0, when='midnight', interval=1, backupCount=0,
+                 compress="gzip", encoding=None, delay=False, utc=False, atTime=None,
+                 on_rotate=None):
+        if compress is not None and compress not in COMPRESSORS:
+            raise ValueError(f"Unknown compression: {compress!r}")
+        super().__init__(filename, when, interval, backupCount, encoding, delay, utc, atTime)
+        self.maxBytes = maxBytes
+        self.compress = compress
+        self.on_rotate = on_rotate
+        self._bytes = os.path.getsize(self.baseFilename) if os.path.exists(self.baseFilename) else 0
+        base = re.escape(os.path.basename(self.baseFilename))
+        self._segmentMatch = re.compile(
+            base + r"\.(\d{4}-\d{2}-\d{2}_\d{2}-\d{2}-\d{2})(?:\.(\d+))?(\.gz|\.bz2|\.xz)?$"
+        )
+        # Segments left uncompressed by a previous run (e.g. killed mid-way)
+        for name in self._segments():
+            if not name.endswith((".gz", ".bz2", ".xz")):
+                _submit_rotation_job(lambda path=os.path.join(self._dir(), name): self._finish_segment(path))
+
+    def _dir(self):
+        return os.path.dirname(self.baseFilename)
+
+    def _segments(self):
+        # Segment file names, oldest first
+        matches = [self._segmentMatch.match(name) for name in os.listdir(self._dir())]
+        matches = [m for m in matches if m]
+        matches.sort(key=lambda m: (m.group(1), int(m.group(2) or 0)))
+        return [m.group(0) for m in matches]
+
+    def emit(self, record):
+        # Format once: the stock RotatingFileHandler formats every record twice
+        # (once to measure it in shouldRollover) and seeks to the end of the file.
+        try:
+            msg = self.format(record) + self.terminator
+            if self._rollover_due(len(msg)):
+                self.doRollover()
+            if self.stream is None:
+                self.stream = self._open()
+            self.stream.write(msg)
+            self.flush()
+            self._bytes += len(msg)
+        except RecursionError:
+            raise
+        except Exception:
+            self.handleError(record)
+
+    def _rollover_due(self, size):
+        # `size` is in characters, which is close enough to bytes for a limit.
+        # A record larger than maxBytes still goes into a fresh, empty file.
+        if time.time() >= self.rolloverAt:
+            return True
+        return self.maxBytes > 0 and self._bytes > 0 and self._bytes + size > self.maxBytes
+
+    def shouldRollover(self, record):
+        return self._rollover_due(len(self.format(record) + self.terminator))
+
+    def doRollover(self):
+        if self.stream:
+            self.stream.close()
+            self.stream = None
+        if os.path.exists(self.baseFilename):
+            stamp = time.strftime(_SEGMENT_TIME_FORMAT, time.gmtime() if self.utc else time.localtime())
+            segment = f"{self.baseFilename}.{stamp}"
+            seq = 0
+            while any(os.path.exists(segment + ext) for ext in ("", ".gz", ".bz2", ".xz")):
+                seq += 1
+                segment = f"{self.baseFilename}.{stamp}.{seq}"
+            os.rename(self.baseFilename, segment) # O(1), whatever the file size
+            _submit_rotation_job(lambda: self._finish_segment(segment))
+        self._bytes = 0
+        now = int(time.time())
+        rollover_at = self.computeRollover(now)
+        while rollover_at <= now:
+            rollover_at += self.interval
+        self.rolloverAt = rollover_at
+        if not self.delay:
+            self.stream = self._open()
+
+    def _finish_segment(self, segment):
+        # Runs on the rotation worker thread
+        if self.on_rotate is not None and os.path.exists(segment):
+            self.on_rotate(segment)
+        if self.compress is not None and os.path.exists(segment):
+            open_compressed, ext = COMPRESSORS[self.compress]
+            with open(segment, "rb") as src, open_compressed(segment + ext + ".tmp", "wb") as dst:
+                shutil.copyfileobj(src, dst, 1024 * 1024)
+            os.replace(segment + ext + ".tmp", segment + ext)
+            os.remove(segment)
+        if self.backupCount > 0:
+            segments = self._segments()
+            for name in segments[:max(0, len(segments) - self.backupCount)]:
+                path = os.path.join(self._dir(), name)
+                for sidecar in (path, path + ".idx", path + ".idx.json"): # log_index files
+                    if os.path.exists(sidecar):
+                        os.remove(sidecar)
+
+
+# --- JSON lines output ---
+# For the log pipeline: one JSON object per record, built by concatenating
+# precomputed '"key":' fragments with encoded values (no per-record dict and
+# no json.dumps() of a dict). JsonLinesHandler appends the bytes straight to
+# the BufferedFileHandler buffer, either newline-terminated or prefixed with
+# a 4-byte big-endian length for fast binary ingestion.
+
+# (json key, LogRecord attribute) written first, in this order, for every record
+DEFAULT_JSON_FIELDS = (
+    ("time", "created"),
+    ("name", "name"),
+    ("level", "levelname"),
+    ("message", "message"),
+)
+
+# Attributes every LogRecord has; anything else on a record came from `extra`
+# (for example the user_id a LoggerAdapter injects) and is written as context.
+_BLANK_RECORD_ATTRS = logging.LogRecord("", 0, "", 0, "", (), None).__dict__
+_RECORD_ATTRS = frozenset(_BLANK_RECORD_ATTRS) | {"message", "asctime"}
+_RECORD_ATTR_COUNT = len(_BLANK_RECORD_ATTRS)
+
+_LENGTH_PREFIX = struct.Struct(">I")
+_encode_json_str = json.encoder.encode_basestring_ascii # C-accelerated, ASCII-only output
+
+
+def _json_value(value):
+    cls = value.__class__
+    if cls is str:
+        return _encode_json_str(value)
+    if cls is int:
+        return int.__repr__(value)
+    if cls is float and math.isfinite(value):
+        return float.__repr__(value)
+    try:
+        return json.dumps(value, default=str, allow_nan=False)
+    except ValueError: # NaN/Infinity (also inside a list or dict) aren't JSON: write it as text
+        return _encode_json_str(str(value))
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats a record as a single-line JSON object (ASCII only).
+
+    `fields` are (key, attribute) pairs written first; every non-standard
+    record attribute (adapter/`extra` context) follows under its own name.
+    """
+
+    def __init__(self, fields=DEFAULT_JSON_FIELDS):
+        super().__init__()
+        self._fields = [
+            (("{" if i == 0 else ",") + _encode_json_str(key) + ":", attr)
+            for i, (key, attr) in enumerate(fields)
+        ]
+        self._field_attrs = frozenset(attr for _, attr in fields) | _RECORD_ATTRS
+        self._key_cache = {} # context key -> precomputed ',"key":' fragment
+
+    def _key_fragment(self, key):
+        fragment = self._key_cache.get(key)
+        if fragment is None:
+            fragment = self._key_cache[key] = "," + _encode_json_str(key) + ":"
+        return fragment
+
+    def format(self, record):
+        record.message = record.getMessage()
+        parts = []
+        append = parts.append
+        for fragment, attr in self._fields:
+            append(fragment)
+            append(_json_value(getattr(record, attr, None)))
+        # LogRecord.__init__ sets its own attributes first and `extra` keys are
+        # added after them, so only the tail of __dict__ can hold context.
+        for key, value in itertools.islice(record.__dict__.items(), _RECORD_ATTR_COUNT, None):
+            if key not in self._field_attrs:
+                append(self._key_fragment(key))
+                append(_json_value(value))
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            append(',"exc_text":')
+            append(_encode_json_str(record.exc_text))
+        if record.stack_info:
+            append(',"stack_info":')
+            append(_encode_json_str(self.formatStack(record.stack_info)))
+        append("}")
+        return "".join(parts)
+
+
+class JsonLinesHandler(BufferedFileHandler):
+    """BufferedFileHandler that writes JsonFormatter output.
+
+    With `length_prefixed=True` each record is written as a 4-byte big-endian
+    length followed by the JSON bytes, instead of a newline-terminated line.
+    """
+
+    def __init__(self, filename, length_prefixed=False, fields=DEFAULT_JSON_FIELDS, **kwargs):
+        super().__init__(filename, **kwargs)
+        self.length_prefixed = length_prefixed
+        self.setFormatter(JsonFormatter(fields))
+
+    def _append(self, record):
+        data = self.format(record).encode("ascii")
+        if self.length_prefixed:
+            self._buffer += _LENGTH_PREFIX.pack(len(data))
+            self._buffer += data
+        else:
+            self._buffer += data
+            self._buffer += b"\n"
+
+
+def read_length_prefixed(path):
+    """Yields the raw JSON bytes of each record in a length-prefixed log file."""
+    with open(path, "rb") as f:
+        while True:
+            header = f.read(_LENGTH_PREFIX.size)
+            if len(header) < _LENGTH_PREFIX.size:
+                return
+            (size,) = _LENGTH_PREFIX.unpack(header)
+            yield f.read(size)
+
+
+# --- Logger registry ---
+# get_logger() used to add a fresh FileHandler + StreamHandler on every call,
+# so a logger fetched N times wrote every line N times and held N file
+# descriptors. The registry below hands back the already-configured logger
+# and shares one handler per log file across all loggers.
+
+_registry_lock = threading.RLock()
+_loggers = {}         # logger name -> configured logger
+_file_handlers = {}   # absolute log file path -> shared FileHandler
+_queue_handlers = {}  # absolute log file path -> (BoundedQueueHandler, QueueListener)
+_aggregator_handlers = {} # multiprocessing queue -> QueueHandler feeding the aggregator
+_aggregator_mode = False  # True once this process runs or feeds a log aggregator
+_console_handler = None
+
+
+def _get_file_handler(path, buffered=False, json_lines=False, length_prefixed=False):
+    # The first logger to ask for a path decides which kind of handler it gets
+    handler = _file_handlers.get(path)
+    if handler is None:
+        if json_lines:
+            handler = JsonLinesHandler(path, length_prefixed=length_prefixed)
+        elif buffered:
+            handler = BufferedFileHandler(path)
+        else:
+            handler = logging.FileHandler(path)
+        if not json_lines:
+            handler.setFormatter(FastFormatter())
+        _file_handlers[path] = handler
+    return handler
+
+
+def _get_console_handler():
+    global _console_handler
+    if _console_handler is None:
+        _console_handler = logging.StreamHandler()
+        _console_handler.setFormatter(FastFormatter())
+    return _console_handler
+
+
+def _get_queue_handler(path, queue_size, overflow, console=True, **file_options):
+    # One queue and one writer thread per log file, shared by every
+    # queue-mode logger writing there. The first call decides the queue
+    # size, overflow policy and whether the writer also prints to the console.
+    if path not in _queue_handlers:
+        log_queue = queue.Queue(maxsize=queue_size)
+        handler = BoundedQueueHandler(log_queue, overflow)
+        handlers = [_get_file_handler(path, **file_options)]
+        if console:
+            handlers.append(_get_console_handler())
+        listener = FlushingQueueListener(log_queue, *handlers, respect_handler_level=True)
+        listener.start()
+        _queue_handlers[path] = (handler, listener)
+    return _queue_handlers[path][0]
+
+
+def stop_queue_listener():
+    """Drains the log queues, stops the writer threads and flushes their handlers."""
+    with _registry_lock:
+        stopped = list(_queue_handlers.values())
+        _queue_handlers.clear()
+        # Forget loggers wired to a stopped queue so get_logger() rebuilds them
+        for handler, _ in stopped:
+            for name, logger in list(_loggers.items()):
+                if handler in logger.handlers:
+                    logger.removeHandler(handler)
+                    del _loggers[name]
+    for _, listener in stopped:
+        listener.stop() # Writes out everything queued before returning
+        for handler in listener.handlers:
+            handler.flush()
+
+
+# Registered after the logging module's own atexit hook, so it runs first
+# and the queues are drained before logging.shutdown() closes handlers.
+atexit.register(stop_queue_listener)
+
+
+def _get_aggregator_handler(aggregator_queue):
+    # The stock QueueHandler already turns records into something picklable
+    # (message merged with its args, traceback rendered to text).
+    _enter_aggregator_mode()
+    handler = _aggregator_handlers.get(aggregator_queue)
+    if handler is None:
+        handler = _aggregator_handlers[aggregator_queue] = logging.handlers.QueueHandler(aggregator_queue)
+    return handler
+
+
+def _enter_aggregator_mode():
+    # Called when this process starts an aggregator or sends records to one
+    global _aggregator_mode
+    _aggregator_mode = True
+
+
+def _reset_registry_after_fork():
+    # Another thread of the parent may have held the lock at the fork
+    global _registry_lock, _console_handler
+    _registry_lock = threading.RLock()
+    if not _aggregator_mode:
+        # Children keep logging through the inherited handlers. Queue mode
+        # needs a writer thread of its own and a fresh queue: what the
+        # parent had queued is the parent's to write.
+        for handler, listener in _queue_handlers.values():
+            handler.queue = listener.queue = queue.Queue(maxsize=handler.queue.maxsize)
+            listener._thread = None
+            listener.start()
+        return
+    # In aggregator mode a forked worker must not write through the parent's
+    # file handlers (that is the interleaving the aggregator avoids) and has
+    # no writer threads, so it starts with an empty registry.
+    managed = set(_file_handlers.values()) | set(_aggregator_handlers.values())
+    managed.update(handler for handler, _ in _queue_handlers.values())
+    if _console_handler is not None:
+        managed.add(_console_handler)
+    for logger in _loggers.values():
+        for handler in list(logger.handlers):
+            if handler in managed:
+                logger.removeHandler(handler)
+    _loggers.clear()
+    _file_handlers.clear()
+    _queue_handlers.clear()
+    _aggregator_handlers.clear()
+    _lazy_loggers.clear()
+    _async_loggers.clear()
+    _console_handler = None
+
+
+os.register_at_fork(after_in_child=_reset_registry_after_fork)
+
+
+def get_logger_stats():
+    """Returns how many loggers, handlers and open log files are live."""
+    with _registry_lock:
+        handlers = {h for logger in _loggers.values() for h in logger.handlers}
+        for _, listener in _queue_handlers.values():
+            handlers.update(listener.handlers)
+        open_files = sum(1 for h in _file_handlers.values() if h.stream is not None)
+        return {
+            "loggers": len(_loggers),
+            "handlers": len(handlers),
+            "file_handlers": len(_file_handlers),
+            "open_files": open_files,
+        }
+
+
+# --- Self-metrics ---
+# instrument_logger() wraps a logger and its handlers with counters. This
+# shows how much time goes to logging without attaching a profiler:
+#   logger:  records passed on to handlers / dropped by the logger's filters
+#   handler: records emitted / dropped by its filters (records below the
+#            handler level never reach it), bytes written, ns in format() and in
+#            emit() (emit_ns includes format_ns), and for queue handlers the
+#            current queue depth, its high-water mark and dropped records
+# Loggers that are not instrumented pay nothing.
+
+METRICS_LOGGER_NAME = "logger_config.metrics"
+
+_metrics_lock = threading.Lock()
+_metrics = {} # "logger:<name>" / "handler:<name>" -> _Counters
+_metered_handlers = {} # "handler:<name>" -> handler
+
+
+class _Counters:
+    def __init__(self, *names):
+        self.lock = threading.Lock()
+        self.values = dict.fromkeys(names, 0)
+
+    def add(self, name, amount=1):
+        with self.lock:
+            self.values[name] += amount
+
+    def snapshot(self):
+        with self.lock:
+            return dict(self.values)
+
+
+def _handler_key(handler):
+    # Caller holds _metrics_lock. Two handlers on the same stream get #2, #3, ...
+    label = (handler.get_name() or getattr(handler, "baseFilename", None)
+             or getattr(getattr(handler, "stream", None), "name", None) or hex(id(handler)))
+    key = base = f"handler:{type(handler).__name__}({label})"
+    for number in itertools.count(2):
+        if key not in _metrics:
+            return key
+        key = f"{base}#{number}"
+
+
+def _output_size(handler):
+    # (encoding of the written text, bytes added per record besides the text)
+    if isinstance(handler, JsonLinesHandler):
+        return "ascii", _LENGTH_PREFIX.size if handler.length_prefixed else 1
+    encoding = (getattr(handler, "encoding", None)
+                or getattr(getattr(handler, "stream", None), "encoding", None) or "utf-8")
+    return encoding, len(getattr(handler, "terminator", "").encode(encoding))
+
+
+def _instrument_filter(obj, counters, passed_counter):
+    original_filter = obj.filter
+
+    def filter(record):
+        passed = original_filter(record)
+        counters.add(passed_counter if passed else "filtered")
+        return passed
+
+    obj.filter = filter
+
+
+def instrument_handler(handler):
+    """Adds self-metrics to `handler` (idempotent). Returns its counters key."""
+    with _metrics_lock:
+        key = getattr(handler, "_metrics_key", None)
+        if key is not None:
+            return key
+        key = handler._metrics_key = _handler_key(handler)
+        is_queue = isinstance(handler, logging.handlers.QueueHandler)
+        names = ["emitted", "filtered", "bytes", "format_ns", "emit_ns"]
+        if is_queue:
+            names.append("queue_high_water")
+        counters = _metrics[key] = _Counters(*names)
+        _metered_handlers[key] = handler
+
+    # Handler.handle() runs filter() and only then emit(); patching the
+    # instance keeps the class (and every other handler) untouched.
+    _instrument_filter(handler, counters, "emitted")
+    original_format = handler.format
+    original_emit = handler.emit
+    encoding, framing_size = _output_size(handler)
+    perf_counter_ns = time.perf_counter_ns
+
+    def format(record):
+        started = perf_counter_ns()
+        text = original_format(record)
+        elapsed = perf_counter_ns() - started
+        with counters.lock:
+            counters.values["format_ns"] += elapsed
+            counters.values["bytes"] += len(text.encode(encoding, "replace")) + framing_size
+        return text
+
+    def emit(record):
+        started = perf_counter_ns()
+        try:
+            original_emit(record)
+        finally:
+            counters.add("emit_ns", perf_counter_ns() - started)
+
+    handler.format = format
+    handler.emit = emit
+
+    if is_queue:
+        original_enqueue = handler.enqueue
+
+        def enqueue(record):
+            original_enqueue(record)
+            depth = handler.queue.qsize()
+            with counters.lock:
+                if depth > counters.values["queue_high_water"]:
+                    counters.values["queue_high_water"] = depth
+
+        handler.enqueue = enqueue
+    return key
+
+
+def instrument_logger(logger):
+    """Adds self-metrics to `logger` and to every handler attached to it (idempotent)."""
+    with _metrics_lock:
+        key = f"logger:{logger.name}"
+        if key in _metrics:
+            instrumented = True
+        else:
+            instrumented = False
+            counters = _metrics[key] = _Counters("emitted", "filtered")
+    if not instrumented:
+        _instrument_filter(logger, counters, "emitted")
+    for handler in logger.handlers:
+        instrument_handler(handler)
     return logger
 
 
+def get_log_metrics():
+    """Returns a snapshot {key: {counter: value}} of every instrumented logger and handler."""
+    with _metrics_lock:
+        items = list(_metrics.items())
+        handlers = dict(_metered_handlers)
+    snapshot = {}
+    for key, counters in items:
+        values = counters.snapshot()
+        handler = handlers.get(key)
+        if isinstance(handler, logging.handlers.QueueHandler):
+            values["queue_depth"] = handler.queue.qsize()
+            values["dropped"] = getattr(handler, "dropped", 0)
+        snapshot[key] = values
+    return snapshot
+
+
+_metrics_reporter_stop = None
+
+
+def start_metrics_reporter(interval=60.0, logger_name=METRICS_LOGGER_NAME):
+    """Logs get_log_metrics() as JSON at INFO through `logger_name` every `interval` seconds.
+
+    Give that logger a handler (or get_logger(logger_name)) to decide where the dumps go.
+    """
+    global _metrics_reporter_stop
+    stop_metrics_reporter()
+    stop = _metrics_reporter_stop = threading.Event()
+    metrics_logger = logging.getLogger(logger_name)
+
+    def report():
+        while not stop.wait(interval):
+            metrics_logger.info("%s", json.dumps(get_log_metrics(), sort_keys=True))
+
+    threading.Thread(target=report, daemon=True, name="log-metrics-reporter").start()
+    return metrics_logger
+
+
+def stop_metrics_reporter():
+    global _metrics_reporter_stop
+    if _metrics_reporter_stop is not None:
+        _metrics_reporter_stop.set()
+        _metrics_reporter_stop = None
+
+
+# --- Lazy messages and cheap level gating ---
+# f-string messages are built even when the level is disabled. The helpers
+# below only build the message text once we know the record will be emitted.
+
+class LazyMessage:
+    """Log message whose text is produced by `func(*args)` only when it is formatted."""
+
+    __slots__ = ("func", "args")
+
+    def __init__(self, func, *args):
+        self.func = func
+        self.args = args
+
+    def __str__(self):
+        return str(self.func(*self.args))
+
+
+def _disabled_call(*args, **kwargs):
+    pass
+
+
+class LazyLogger:
+    """Wraps a logger so calls for a disabled level cost as little as possible.
+
+    Messages can be %-style templates with deferred args, or zero-argument
+    callables that are only run when the level is enabled. Once a level is
+    found disabled, its method (debug, info, ...) is swapped for a no-op.
+    The swap is undone by LazyLogger.setLevel(), set_logger_level() and
+    disable_logging(); after changing levels through the logging module
+    directly, call refresh_lazy_loggers().
+    """
+
+    def __init__(self, logger):
+        self.logger = logger
+        self.name = logger.name
+        self._enabled = {}  # level -> cached isEnabledFor() answer
+        self._gated = []    # names of methods currently swapped for the no-op
+        _live_lazy_loggers.add(self)
+
+    def isEnabledFor(self, level):
+        try:
+            return self._enabled[level]
+        except KeyError:
+            # Under the lock, so a level change can't slip in between asking
+            # the logger and caching its answer
+            with _lazy_lock:
+                enabled = self._enabled[level] = self.logger.isEnabledFor(level)
+            return enabled
+
+    def setLevel(self, level):
+        set_logger_level(self.logger, level)
+
+    def _invalidate(self):
+        self._enabled.clear()
+        for method_name in self._gated:
+            self.__dict__.pop(method_name, None)
+        self._gated = []
+
+    def _gate(self, method_name, level):
+        if self.isEnabledFor(level):
+            return True
+        with _lazy_lock: # Check again and swap with no invalidation in between
+            if self.isEnabledFor(level):
+                return True
+            setattr(self, method_name, _disabled_call)
+            self._gated.append(method_name)
+        return False
+
+    def _emit(self, level, msg, args, kwargs):
+        if callable(msg):
+            msg = msg()
+        # Report the caller of debug()/info()/... as the source line, not this module
+        kwargs["stacklevel"] = kwargs.get("stacklevel", 1) + 2
+        self.logger._log(level, msg, args, **kwargs)
+
+    def debug(self, msg, *args, **kwargs):
+        if self._gate("debug", logging.DEBUG):
+            self._emit(logging.DEBUG, msg, args, kwargs)
+
+    def info(self, msg, *args, **kwargs):
+        if self._gate("info", logging.INFO):
+            self._emit(logging.INFO, msg, args, kwargs)
+
+    def warning(self, msg, *args, **kwargs):
+        if self._gate("warning", logging.WARNING):
+            self._emit(logging.WARNING, msg, args, kwargs)
+
+    def error(self, msg, *args, **kwargs):
+        if self._gate("error", logging.ERROR):
+            self._emit(logging.ERROR, msg, args, kwargs)
+
+    def exception(self, msg, *args, exc_info=True, **kwargs):
+        if self._gate("exception", logging.ERROR):
+            kwargs["exc_info"] = exc_info
+            self._emit(logging.ERROR, msg, args, kwargs)
+
+    def critical(self, msg, *args, **kwargs):
+        if self._gate("critical", logging.CRITICAL):
+            self._emit(logging.CRITICAL, msg, args, kwargs)
+
+    def log(self, level, msg, *args, **kwargs):
+        if self.isEnabledFor(level):
+            self._emit(level, msg, args, kwargs)
+
+
+_lazy_loggers = {} # logger name -> LazyLogger from get_lazy_logger()
+_live_lazy_loggers = weakref.WeakSet() # every LazyLogger, however it was created
+
+
+_lazy_lock = threading.RLock() # Level changes vs. caching an answer or swapping a method
+
+
+def refresh_lazy_loggers():
+    """Drops every LazyLogger's cached level answers and no-op methods."""
+    with _lazy_lock:
+        for lazy_logger in list(_live_lazy_loggers):
+            lazy_logger._invalidate()
+
+
+def set_logger_level(logger, level):
+    """logger.setLevel(level) (a Logger or its name) that also refreshes the LazyLoggers.
+
+    A level change affects the logger's children too, so all of them are refreshed.
+    """
+    if isinstance(logger, str):
+        logger = logging.getLogger(logger)
+    with _lazy_lock:
+        logger.setLevel(level)
+        refresh_lazy_loggers()
+
+
+def disable_logging(level=logging.CRITICAL):
+    """logging.disable(level) that also refreshes the LazyLoggers."""
+    with _lazy_lock:
+        logging.disable(level)
+        refresh_lazy_loggers()
+
+
+def get_lazy_logger(name, **options):
+    """Returns a LazyLogger around get_logger(name, **options)."""
+    with _registry_lock:
+        lazy_logger = _lazy_loggers.get(name)
+        if lazy_logger is None:
+            lazy_logger = _lazy_loggers[name] = LazyLogger(get_logger(name, **options))
+        return lazy_logger
+
+
+# --- Request/user context without per-call dicts ---
+# A LoggerAdapter per user that builds a fresh `extra` dict on every call is a
+# lot of garbage at tens of thousands of concurrent requests. Instead the
+# context is bound once per task/thread into a contextvar as an immutable
+# dict, and ContextAdapter passes that same dict as `extra` on every call.
+#
+# asyncio tasks get a copy of the context when they are created, so each task
+# sees what was bound in it (or before it was started). Threads do not inherit
+# contextvars; use submit_with_log_context() for thread pools.
+
+class _LogContext(dict):
+    # The bound fields, plus each ContextAdapter's defaults merged with them
+    # (adapter -> dict), built once per context so concurrent tasks with
+    # different contexts never rebuild each other's. Weakly keyed: a context
+    # (the empty one lives forever) must not keep short-lived adapters alive.
+    __slots__ = ("merged",)
+
+    def __init__(self, fields=()):
+        super().__init__(fields)
+        self.merged = weakref.WeakKeyDictionary()
+
+
+_EMPTY_CONTEXT = _LogContext()
+_log_context = contextvars.ContextVar("log_context", default=_EMPTY_CONTEXT)
+
+
+def bind_log_context(**fields):
+    """Adds `fields` to the log context of the current task/thread. Returns a reset token."""
+    for key in fields:
+        if key in _RECORD_ATTRS:
+            raise KeyError(f"Attempt to overwrite {key!r} in LogRecord")
+    # Never mutated after this point, so it can be handed out as `extra` as-is
+    return _log_context.set(_LogContext({**_log_context.get(), **fields}))
+
+
+def reset_log_context(token):
+    """Restores the context that was active before bind_log_context() returned `token`."""
+    _log_context.reset(token)
+
+
+@contextlib.contextmanager
+def log_context(**fields):
+    """with log_context(request_id=..., user_id=...): binds fields for the block."""
+    token = bind_log_context(**fields)
+    try:
+        yield
+    finally:
+        _log_context.reset(token)
+
+
+def get_log_context():
+    return _log_context.get()
+
+
+def submit_with_log_context(executor, fn, *args, **kwargs):
+    """executor.submit() that runs `fn` with the caller's log context."""
+    return executor.submit(contextvars.copy_context().run, fn, *args, **kwargs)
+
+
+class ContextAdapter(logging.LoggerAdapter):
+    """LoggerAdapter that adds the current log context to every record.
+
+    `defaults` fill in fields the context doesn't set (for example so a
+    %(user_id)s format always works). The merged dict is built on the first
+    call in a context and kept with that context, so later calls are a lookup
+    and allocate nothing extra, whatever other tasks bind meanwhile, unless
+    the caller passes its own `extra`.
+    """
+
+    def __init__(self, logger, **defaults):
+        super().__init__(logger, defaults)
+
+    def process(self, msg, kwargs):
+        context = _log_context.get()
+        if self.extra:
+            try:
+                merged = context.merged[self]
+            except KeyError:
+                merged = context.merged[self] = {**self.extra, **context}
+        else:
+            merged = context
+        if "extra" in kwargs:
+            kwargs["extra"] = {**merged, **kwargs["extra"]}
+        else:
+            kwargs["extra"] = merged
+        return msg, kwargs
+
+
+def get_logger(name, log_file=LOG_FILE, use_queue=False,
+               queue_size=DEFAULT_QUEUE_SIZE, overflow=OVERFLOW_BLOCK, buffered=False,
+               json_lines=False, length_prefixed=False, aggregator_queue=None, metrics=False,
+               dedup_exceptions=False, console=True):
+    # Calling this again for the same name returns the logger configured
+    # the first time; later arguments are ignored.
+    # console=False leaves out the shared stderr handler.
+    # With `aggregator_queue` (see log_aggregator.LogAggregator) records are only
+    # sent to the aggregator process, which owns the file; log_file is unused.
+    with _registry_lock:
+        logger = _loggers.get(name)
+        if logger is not None:
+            return logger
+
+        logger = logging.getLogger(name)
+        logger.setLevel(logging.DEBUG)
+
+        if aggregator_queue is not None:
+            logger.addHandler(_get_aggregator_handler(aggregator_queue))
+        else:
+            path = os.path.abspath(log_file)
+            file_options = {"buffered": buffered, "json_lines": json_lines, "length_prefixed": length_prefixed}
+            if use_queue:
+                handler = _get_queue_handler(path, queue_size, overflow, console, **file_options)
+                logger.addHandler(handler)
+                if metrics:
+                    # The writer thread's handlers are not on any logger
+                    for listener_handler in _queue_handlers[path][1].handlers:
+                        instrument_handler(listener_handler)
+            else:
+                logger.addHandler(_get_file_handler(path, **file_options))
+                if console:
+                    logger.addHandler(_get_console_handler())
+
+        if dedup_exceptions:
+            logger.addFilter(DedupExceptionFilter())
+        if metrics:
+            instrument_logger(logger)
+        _loggers[name] = logger
+        return logger
+
+
+# --- asyncio ---
+# A normal logger call writes to the file (and stderr) on the calling thread,
+# which inside a coroutine means the event loop waits for the disk. An
+# AsyncLogger only ever puts records on a BoundedQueueHandler queue with a
+# dropping overflow policy, so a call never waits for I/O or for queue space;
+# the writer thread does the formatting and the writes.
+#
+#   logger = get_async_logger("api")
+#   logger.info("Request %s handled", request_id)  # no await needed
+#   await logger.flush()                           # e.g. on shutdown
+
+
+def _resolve(future):
+    if not future.done(): # The awaiting task may have been cancelled
+        future.set_result(None)
+
+
+class AsyncLogger(logging.LoggerAdapter):
+    """Logger for coroutines whose calls never block the event loop.
+
+    The wrapped logger must only have BoundedQueueHandlers with a dropping
+    overflow policy, and must not propagate (an ancestor's handlers would
+    run on the event loop).
+
+    This is a trade-off, not a free win: the writer thread competes with the
+    loop for the GIL while it formats, so on a fast disk the loop's tail lag
+    is worse than with a plain FileHandler (about 11 ms against 3 ms p99 in
+    logging_benchmarks.py). Use it when writes can stall (slow or network
+    disks), where it keeps those stalls off the loop.
+    """
+
+    def __init__(self, logger):
+        _check_nonblocking(logger)
+        if logger.propagate:
+            raise ValueError(f"{logger.name!r} propagates to its parent's handlers")
+        super().__init__(logger, None)
+
+    def process(self, msg, kwargs):
+        return msg, kwargs
+
+    async def flush(self):
+        """Waits, without blocking the loop, until every record logged so far is written.
+
+        Returns at once for queues whose writer was stopped by
+        stop_queue_listener(), which writes out what was queued itself.
+        """
+        loop = asyncio.get_running_loop()
+        pending = []
+        for handler in self.logger.handlers:
+            written = loop.create_future()
+
+            def done(written=written):
+                with contextlib.suppress(RuntimeError): # The loop was closed meanwhile
+                    loop.call_soon_threadsafe(_resolve, written)
+
+            # stop_queue_listener() unregisters a queue before stopping its
+            # writer, so a request made while it is registered is still served
+            with _registry_lock:
+                if not any(handler is queued for queued, _ in _queue_handlers.values()):
+                    continue
+                handler.request_flush(done)
+            pending.append(written)
+        await asyncio.gather(*pending)
+
+
+def _check_nonblocking(logger):
+    for handler in logger.handlers:
+        if not isinstance(handler, BoundedQueueHandler) or handler.overflow == OVERFLOW_BLOCK:
+            raise ValueError(f"{logger.name!r} has a handler that can block: {handler!r}")
+
+
+_async_loggers = {} # logger name -> AsyncLogger from get_async_logger()
+
+
+def get_async_logger(name, overflow=OVERFLOW_DROP_OLDEST, **options):
+    """Returns an AsyncLogger around get_logger(name, use_queue=True, **options).
 
+    The logger stops propagating to its parents.
+    """
+    if overflow == OVERFLOW_BLOCK:
+        raise ValueError("An AsyncLogger can't use the blocking overflow policy")
+    if options.get("aggregator_queue") is not None:
+        raise ValueError("An AsyncLogger can't send to an aggregator (its queue put can block)")
+    with _registry_lock:
+        async_logger = _async_loggers.get(name)
+        if async_logger is None or name not in _loggers: # stop_queue_listener() forgets loggers
+            # Checked before get_logger(), so a refused logger is left unconfigured
+            if name in _loggers:
+                _check_nonblocking(_loggers[name])
+            else:
+                path = os.path.abspath(options.get("log_file", LOG_FILE))
+                if path in _queue_handlers and _queue_handlers[path][0].overflow == OVERFLOW_BLOCK:
+                    raise ValueError(f"The queue of {path!r} already uses the blocking overflow policy")
+            logger = get_logger(name, use_queue=True, overflow=overflow, **options)
+            logger.propagate = False
+            async_logger = _async_loggers[name] = AsyncLogger(logger)
+        return async_logger
@@ -0,0 +1,218 @@
+import asyncio
+import json
+import logging
+import os
+import queue
+import statistics
+import time
+import timeit
+
+from logger_config import (
+    LOG_FORMAT, OVERFLOW_DROP_OLDEST, AsyncLogger, BoundedQueueHandler, FastFormatter,
+    FlushingQueueListener, JsonFormatter, LazyLogger, LazyMessage, get_async_logger, get_logger,
+)
+
+print("--- Logging Micro-Benchmarks ---")
+
+NUMBER = 200000 # Calls per measurement
+
+
+def per_call_ns(stmt, setup_globals):
+    """Runs `stmt` NUMBER times (best of 5) and returns nanoseconds per call."""
+    best = min(timeit.repeat(stmt, globals=setup_globals, number=NUMBER, repeat=5))
+    return best / NUMBER * 1e9
+
+
+# --- 1. Cost of a Disabled DEBUG Call ---
+# The logger is at INFO, so none of these calls produce a record.
+# What is measured is only the price of asking.
+
+print("\n--- 1. Cost of a Disabled DEBUG Call ---")
+
+bench_logger = logging.getLogger("bench_disabled")
+bench_logger.setLevel(logging.INFO)
+bench_logger.propagate = False
+bench_logger.addHandler(logging.NullHandler())
+lazy_bench_logger = LazyLogger(bench_logger)
+
+a, b = 20, 5
+bench_globals = {
+    "logger": bench_logger,
+    "lazy": lazy_bench_logger,
+    "LazyMessage": LazyMessage,
+    "a": a,
+    "b": b,
+}
+cases = [
+    ("f-string", 'logger.debug(f"Calculating with a={a}, b={b}")'),
+    ("%-style args", 'logger.debug("Calculating with a=%s, b=%s", a, b)'),
+    ("LazyMessage", 'logger.debug(LazyMessage(str.format, "a={}, b={}", a, b))'),
+    ("LazyLogger %-style", 'lazy.debug("Calculating with a=%s, b=%s", a, b)'),
+    ("LazyLogger callable", 'lazy.debug(lambda: f"Calculating with a={a}, b={b}")'),
+    ("isEnabledFor guard", 'lazy.isEnabledFor(10) and lazy.debug("a=%s", a)'),
+]
+for label, stmt in cases:
+    print(f"  {label:<22} {per_call_ns(stmt, bench_globals):8.1f} ns/call")
+print("-" * 30)
+
+# --- 2. Formatting the Standard Layout ---
+# Same record, same LOG_FORMAT. FastFormatter must give the exact same text.
+
+print("\n--- 2. Formatting the Standard Layout ---")
+
+stock_formatter = logging.Formatter(LOG_FORMAT)
+fast_formatter = FastFormatter(LOG_FORMAT)
+record = logging.LogRecord("bench", logging.INFO, __file__, 1, "Calculation result: %s", (4.0,), None)
+assert stock_formatter.format(record) == fast_formatter.format(record)
+for datefmt in ("%H:%M", "%Y-%m-%dT%H:%M:%S"):
+    assert logging.Formatter(LOG_FORMAT, datefmt).format(record) == FastFormatter(LOG_FORMAT, datefmt).format(record)
+print(f"  Output: {fast_formatter.format(record)}")
+
+format_globals = {"stock": stock_formatter, "fast": fast_formatter, "record": record}
+stock_ns = per_call_ns("stock.format(record)", format_globals)
+fast_ns = per_call_ns("fast.format(record)", format_globals)
+print(f"  logging.Formatter      {stock_ns:8.1f} ns/record")
+print(f"  FastFormatter          {fast_ns:8.1f} ns/record  ({stock_ns / fast_ns:.1f}x)")
+print("-" * 30)
+
+# --- 3. JSON Lines Serialization ---
+# The usual approach builds a dict per record and calls json.dumps() on it.
+
+print("\n--- 3. JSON Lines Serialization ---")
+
+json_formatter = JsonFormatter()
+json_record = logging.LogRecord("bench", logging.INFO, __file__, 1, "User activity logged.", (), None)
+json_record.user_id = "user_123" # What a LoggerAdapter / extra= would add
+
+
+def dict_then_dumps(record):
+    """The per-record dict + json.dumps() baseline."""
+    return json.dumps({
+        "time": record.created,
+        "name": record.name,
+        "level": record.levelname,
+        "message": record.getMessage(),
+        "user_id": record.user_id,
+    })
+
+
+assert json.loads(dict_then_dumps(json_record)) == json.loads(json_formatter.format(json_record))
+print(f"  Output: {json_formatter.format(json_record)}")
+
+json_globals = {"baseline": dict_then_dumps, "fmt": json_formatter, "record": json_record}
+baseline_ns = per_call_ns("baseline(record)", json_globals)
+json_ns = per_call_ns("fmt.format(record)", json_globals)
+print(f"  dict + json.dumps      {baseline_ns:8.1f} ns/record")
+print(f"  JsonFormatter          {json_ns:8.1f} ns/record  ({baseline_ns / json_ns:.1f}x)")
+print("-" * 30)
+
+# --- 4. Multi-Process Throughput Through One Aggregator ---
+# N worker processes send records to one aggregator process that owns the file.
+# The check also verifies that every record arrived as one complete line.
+# Guarded so start methods that re-import this script don't re-run it.
+
+if __name__ == "__main__":
+    from log_aggregator import measure_throughput
+
+    print("\n--- 4. Multi-Process Throughput Through One Aggregator ---")
+    RECORDS_PER_WORKER = 20000
+    for workers in sorted({1, 2, 4, os.cpu_count() or 1}):
+        rate = measure_throughput(workers, RECORDS_PER_WORKER)
+        print(f"  {workers:>2} worker(s)   {rate:10.0f} records/s")
+    print("-" * 30)
+
+    # --- 5. Event-Loop Lag Under Heavy Logging ---
+    # A ticker task asks to wake up every millisecond while producer tasks log as
+    # fast as they can. How late the ticker wakes up is the time the loop spent
+    # stuck inside logging calls, which is what shows up in tail latency.
+    # "slow disk" stalls the file write for 20 ms every 2000 records.
+    # The AsyncLogger's writer thread competes with the loop for the GIL while
+    # it formats, so on a fast disk its tail lag is several times worse than
+    # plain writes (p99 around 11 ms against under 3 ms here). It only wins
+    # when the disk stalls.
+
+    LAG_RECORDS = 20000
+    LAG_TICK = 0.001 # seconds
+
+
+    class SlowDiskFileHandler(logging.FileHandler):
+        """FileHandler whose writes stall now and then, like a busy disk."""
+
+        def __init__(self, filename, stall=0.02, every=2000):
+            super().__init__(filename)
+            self.stall = stall
+            self.every = every
+            self._written = 0
+
+        def emit(self, record):
+            super().emit(record)
+            self._written += 1
+            if self._written % self.every == 0:
+                time.sleep(self.stall)
+
+
+    async def measure_loop_lag(logger, records=LAG_RECORDS, producers=4):
+        """Logs `records` records from `producers` tasks and returns the ticker's lags (seconds)."""
+        loop = asyncio.get_running_loop()
+        lags = []
+        done = asyncio.Event()
+
+        async def ticker():
+            while not done.is_set():
+                before = loop.time()
+                await asyncio.sleep(LAG_TICK)
+                lags.append(loop.time() - before - LAG_TICK)
+
+        async def producer(producer_id):
+            for i in range(records // producers):
+                logger.info("producer %d request %d handled in %.2f ms", producer_id, i, 1.25)
+                if i % 10 == 0:
+                    await asyncio.sleep(0) # Let the other tasks run, like real handlers would
+
+        ticker_task = asyncio.create_task(ticker())
+        await asyncio.gather(*(producer(n) for n in range(producers)))
+        if isinstance(logger, AsyncLogger):
+            await logger.flush()
+        done.set()
+        await ticker_task
+        return lags
+
+
+    def report_lag(label, lags):
+        lags_ms = sorted(lag * 1000 for lag in lags)
+        p99 = lags_ms[int(len(lags_ms) * 0.99)]
+        print(f"  {label:<22} p50 {statistics.median(lags_ms):6.2f} ms   p99 {p99:6.2f} ms   max {lags_ms[-1]:6.2f} ms")
+
+    print("\n--- 5. Event-Loop Lag Under Heavy Logging ---")
+    lag_files = ["lag_sync.log", "lag_async.log", "lag_slow_sync.log", "lag_slow_async.log"]
+
+    sync_lag_logger = get_logger("lag_sync", log_file="lag_sync.log", console=False)
+    sync_lag_logger.propagate = False
+    report_lag("sync FileHandler", asyncio.run(measure_loop_lag(sync_lag_logger)))
+
+    async_lag_logger = get_async_logger("lag_async", log_file="lag_async.log", console=False)
+    report_lag("AsyncLogger", asyncio.run(measure_loop_lag(async_lag_logger)))
+
+    slow_sync_logger = logging.getLogger("lag_slow_sync")
+    slow_sync_logger.propagate = False
+    slow_sync_logger.setLevel(logging.INFO)
+    slow_sync_logger.addHandler(SlowDiskFileHandler("lag_slow_sync.log"))
+    report_lag("sync, slow disk", asyncio.run(measure_loop_lag(slow_sync_logger)))
+
+    # Same queue setup as get_async_logger(), with the slow handler behind it
+    slow_queue = queue.Queue(LAG_RECORDS)
+    slow_listener = FlushingQueueListener(slow_queue, SlowDiskFileHandler("lag_slow_async.log"))
+    slow_listener.start()
+    slow_async_base = logging.getLogger("lag_slow_async")
+    slow_async_base.propagate = False
+    slow_async_base.setLevel(logging.INFO)
+    slow_async_base.addHandler(BoundedQueueHandler(slow_queue, OVERFLOW_DROP_OLDEST))
+    report_lag("AsyncLogger, slow disk", asyncio.run(measure_loop_lag(AsyncLogger(slow_async_base))))
+    slow_listener.stop()
+    print("  Fast disk: AsyncLogger's writer thread holds the GIL the loop needs,")
+    print("  so its tail lag is higher than plain writes. It pays off only when")
+    print("  writes stall (slow disk).")
+
+    for lag_file in lag_files:
+        os.remove(lag_file)
+    print("-" * 30)
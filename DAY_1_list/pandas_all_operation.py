@@ -605,6 +605,19 @@ print(f"\nID column in uppercase:\n{df_str}")
 s_str_nan = pd.Series(['hello', np.nan, 'world'])
 print(f"\nString Series with NaN:\n{s_str_nan.str.upper()}") # .str methods handle NaN gracefully, return NaN
 
+# Example 16.6: Regex over a whole column at once
+# .str.contains()/.str.replace() run the regex row by row; for millions of rows
+# regex_vectorized does the same work over the joined column and skips nulls up front.
+import regex_vectorized
+
+s_log = pd.Series(['ERR-404: missing page', np.nan, 'all good', 'ERR-500: server  down'])
+has_error = regex_vectorized.contains(r'ERR-\d{3}', s_log)
+print(f"\nRows with an error code:\n{has_error}")
+error_parts = regex_vectorized.extract(r'ERR-(?P<code>\d{3}): (\w+)', s_log)
+print(f"\nExtracted error codes:\n{error_parts}")
+s_log_clean = regex_vectorized.sub(r'\s+', ' ', s_log)
+print(f"\nWhitespace collapsed:\n{s_log_clean}")
+
 
 # --- 17. Date/Time Accessors (.dt accessor) ---
 # Problem: Extract specific components (year, month, day, day of week) from datetime Series.
@@ -487,15 +487,157 @@ print("\n--- Testing Capturing Warnings (requires logging setup) ---")
 # If you integrate this into a larger system, ensure your main logging setup handles this.
 import logging
 logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s')
-logging.captureWarnings(True) # Direct warnings to the logging system
+# capture_warnings() is logging.captureWarnings() that logs each warning location
+# once and only counts repeats (see warnings_bridge.py).
+from warnings_bridge import capture_warnings
+capture_warnings(True) # Direct warnings to the logging system
 
 # Issue a warning using the warnings module
 warnings.warn("This is a warning from the warnings module!", UserWarning)
 warnings.warn("Another warning that should appear in logs.", DeprecationWarning)
 
 # Reset captureWarnings to default (False) if needed
-# logging.captureWarnings(False)
+# capture_warnings(False)
 print("-" * 30)
 
 
+# --- 16. Compile Cache for Many Patterns ---
+# re keeps only 512 compiled patterns and evicts the oldest one first, so a job
+# using hundreds of patterns keeps recompiling them. regex_cache has the same
+# functions as re on top of a larger LRU cache, with statistics.
+print("16. regex_cache (compiled pattern LRU):")
+import regex_cache
+
+regex_cache.warm([r"apple", pattern_emails, (r"hello", re.I)]) # Declared set, compiled at startup
+print(f"  findall 'apple': {regex_cache.findall(r'apple', 'apple banana apple orange apple')}")
+print(f"  email parts: {regex_cache.findall(pattern_emails, text_emails)}")
+print(f"  re.I: {regex_cache.findall(r'hello', text_flags, re.I)}")
+print(f"  Cache stats: {regex_cache.cache_stats()}")
+print("-" * 30)
+
+# --- 17. Many Patterns in One Pass ---
+# Each re.findall() call scans the whole text again. MultiPattern scans it once
+# for a named set of patterns and tags every match with the pattern's name.
+# Every pattern gets the same matches its own re.findall() would give.
+print("17. MultiPattern (one scan, many patterns):")
+from regex_multi import MultiPattern
+
+phone_text = "My phone number is 123-456-7890. Call me at 987.654.3210."
+phone_patterns = MultiPattern({
+    "last_digits": r"\d{3}-\d{4}",
+    "call": r"\bCall\b",
+    "numbers": r"\d+",
+    "vowels": (r"[aeiou]", re.I),
+})
+for name, match in phone_patterns.finditer(phone_text):
+    if name != "vowels":
+        print(f"  {name:<12} '{match.group()}' at {match.span()}")
+print(f"  findall-style result: {phone_patterns.findall(phone_text)['last_digits']}")
+print("-" * 30)
+
+# --- 18. Literal Prefilter ---
+# Every match of r"fox" contains "fox", every email match contains "@". A plain
+# substring check (`in`) rules out most texts far faster than the regex can.
+print("18. Literal prefilter:")
+from regex_prefilter import PrefilteredPattern, required_literals
+
+for prefilter_pattern in [r"fox", r"apple", r"ain", pattern_capture, pattern_emails, r"colou?r"]:
+    print(f"  Required literals of {prefilter_pattern!r}: {required_literals(prefilter_pattern)}")
+
+email_finder = PrefilteredPattern(pattern_emails)
+inbox = ["no address here", "contact: user1@example.com", "another plain line"]
+print(f"  Emails: {[email_finder.findall(line) for line in inbox]}, lines skipped: {email_finder.skipped}")
+print("-" * 30)
+
+# --- 19. Searching Files Without Loading Them ---
+# finditer_file() runs a pattern over a file of any size: memory-mapped for
+# bytes patterns, in chunks otherwise. Offsets are positions in the file.
+print("19. Streaming over files:")
+from regex_stream import finditer_file, sub_file
+
+stream_file = "re_stream_example.txt"
+with open(stream_file, "w") as f:
+    f.write("The rain in Spain falls mainly on the plain.\n" * 3)
+for match in finditer_file(rb"ain\b", stream_file):
+    print(f"    Found {match.group()!r} at file offset {match.span()}")
+replaced = sub_file(r"colou?r|rain", "weather", stream_file, stream_file + ".out", chunk_size=16, max_match_length=32)
+print(f"  sub_file() made {replaced} replacements in chunks of 16 characters")
+clean_log_files(stream_file, stream_file + ".out")
+print("-" * 30)
+
+# --- 20. Extraction on Several Cores ---
+# Threads don't speed up regex work (the GIL), processes do. extract() hands
+# documents to a process pool in chunks and yields (index, results) pairs.
+# Pool workers may import this script again, hence the __main__ check.
+print("20. Parallel extraction:")
+from regex_parallel import extract
+
+if __name__ == "__main__":
+    emails_pattern = re.compile(pattern_emails)
+    documents = [text_emails, "nobody here", phone_text, "support@example.org"]
+    for index, found in extract([emails_pattern, r"\d{3}-\d{4}"], documents, processes=2, chunksize=2):
+        print(f"  document {index}: emails {found[0]}, numbers {found[1]}")
+print("-" * 30)
+
+# --- 21. Validators for Common Fields ---
+# Precompiled checks for email, phone, IPv4, ISO date and UUID. Values that
+# can't match (wrong length, separators in the wrong place) are rejected
+# before the regex engine runs; the answer is always the regex's.
+print("21. Field validators and extractors:")
+import regex_validators
+
+for kind, value in [("phone", phone_number), ("phone", "123-45-67890"), ("email", "user1@example.com"),
+                    ("ipv4", "192.168.1.300"), ("iso_date", "2024-02-29"), ("uuid", "not-a-uuid")]:
+    print(f"  {kind:<9} {value!r:<22} valid: {regex_validators.validate(kind, value)}")
+print(f"  Emails in text_emails: {regex_validators.extract('email', text_emails)}")
+print(f"  Everything in one scan: {regex_validators.extract_all('Call 123.456.7890 from 10.0.0.1 on 2024-01-31.')}")
+print("-" * 30)
+
+# --- 22. Compiled Templates and One-Pass Replacement ---
+# Substitution parses a replacement template once and fills it in without a
+# Python call per match. Replacer applies a whole dict of replacements in one
+# pass, instead of one re.sub() per entry.
+print("22. Compiled substitution templates:")
+from regex_sub import Replacer, Substitution
+
+swap_parts = Substitution(pattern_emails, r"\2 <- \1")
+print(f"  Swapped email parts: {swap_parts.sub(text_emails)}")
+american = Replacer({'colour': 'color', 'favourite': 'favorite'})
+spelling_text = "Color, colour, favorite, favourite" # From section 5
+print(f"  One pass: {american.subn(spelling_text)}")
+any_case = Replacer({'colour': 'color', 'favourite': 'favorite'}, ignore_case=True, whole_words=True)
+print(f"  ignore_case, whole_words: {any_case.sub('Colour me FAVOURITE, colours stay')}")
+print("-" * 30)
+
+# --- 23. Checking Patterns for Catastrophic Backtracking ---
+# A nested repeat like (a+)+ can try exponentially many ways to split a text
+# before it gives up. lint() points out such structures, safe_compile()
+# refuses the exponential ones, and time_limit() stops a running match.
+print("23. Catastrophic backtracking:")
+from regex_lint import RegexSandbox, lint, safe_compile, time_limit
+
+for checked_pattern in (greedy_pattern, pattern_conditional.pattern, r"(?:cat|horse)+", r"(\w+\s?)+$", r"\d+\d+-"):
+    findings = [f"{finding.kind} ({finding.severity})" for finding in lint(checked_pattern)]
+    print(f"  lint({checked_pattern!r}): {findings or 'no findings'}")
+try:
+    safe_compile(r"(a+)+$")
+except ValueError as e:
+    print(f"  safe_compile refused: {e}")
+try:
+    with time_limit(0.1):
+        re.match(r"(a+)+$", "a" * 40 + "b")
+except TimeoutError as e:
+    print(f"  time_limit: {e}")
+
+if __name__ == "__main__":
+    # The sandbox runs the regex in a helper process it can kill
+    with RegexSandbox(timeout=0.1) as sandbox:
+        try:
+            sandbox.match(r"(a+)+$", "a" * 40 + "b")
+        except TimeoutError as e:
+            print(f"  RegexSandbox: {e}")
+        error_codes = sandbox.findall(r"ERR-\d+", "ERR-1 ok ERR-22")
+        print(f"  RegexSandbox after a timeout: {error_codes}")
+print("-" * 30)
+
 print("\n--- End of re Module Examples ---")
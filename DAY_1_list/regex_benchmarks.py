@@ -0,0 +1,342 @@
+import io
+import os
+import random
+import re
+import tempfile
+import timeit
+import tracemalloc
+
+import pandas as pd
+
+import regex_cache
+import regex_lint
+import regex_validators
+import regex_vectorized
+from regex_multi import MultiPattern
+from regex_parallel import EXTRACTION_PATTERNS, extract_all, scaling_curve
+from regex_prefilter import PrefilteredPattern, grep
+from regex_stream import finditer_file
+from regex_sub import Replacer, Substitution
+
+print("--- Regex Micro-Benchmarks ---")
+
+REPEAT = 5 # Measurements per case; the best one is reported
+
+
+def best_seconds(fn, number=1):
+    """Runs fn() `number` times per measurement and returns the best total time."""
+    return min(timeit.repeat(fn, number=number, repeat=REPEAT))
+
+
+# --- 1. Many Patterns Through a Compile Cache ---
+# A log-parsing job cycling through more patterns than re's internal cache
+# holds (512) recompiles on every call. The same loop through regex_cache,
+# whose LRU holds them all, compiles each pattern once.
+
+print("\n--- 1. Many Patterns Through a Compile Cache ---")
+
+cache_patterns = [rf"user(\d+)_{n}@(\w+)\.example\.com" for n in range(600)]
+cache_line = "login ok for user42_17@mail.example.com from 10.0.0.1"
+
+
+def search_with_re():
+    for pattern in cache_patterns:
+        re.search(pattern, cache_line)
+
+
+def search_with_cache():
+    for pattern in cache_patterns:
+        regex_cache.search(pattern, cache_line)
+
+
+regex_cache.warm(cache_patterns)
+re_seconds = best_seconds(search_with_re)
+cache_seconds = best_seconds(search_with_cache)
+print(f"  re.search              {re_seconds * 1e3:8.2f} ms per {len(cache_patterns)} patterns")
+print(f"  regex_cache.search     {cache_seconds * 1e3:8.2f} ms per {len(cache_patterns)} patterns  ({re_seconds / cache_seconds:.1f}x)")
+print(f"  Cache stats: {regex_cache.cache_stats()}")
+print("-" * 30)
+
+# --- 2. 200 Patterns Over Each Line ---
+# Ingestion-style rules: 200 patterns, about 1 line in 100 matches one of
+# them. Separate findall() calls scan every line 200 times; MultiPattern
+# scans it once and only tries the rules where something can match.
+
+print("\n--- 2. 200 Patterns Over Each Line ---")
+
+random.seed(42)
+rule_patterns = {f"rule{n}": rf"\b(?:ERR|WARN)-{n:03d}\b: (\w+)" for n in range(200)}
+log_words = ["GET", "/api/v1/items", "200", "ok", "user", "latency", "ms", "INFO", "cache", "hit"]
+log_lines = []
+for n in range(2000):
+    line = " ".join(random.choice(log_words) for _ in range(12))
+    if n % 100 == 0:
+        line += f" ERR-{random.randrange(200):03d}: disk"
+    log_lines.append(line)
+
+compiled_rules = [re.compile(pattern) for pattern in rule_patterns.values()]
+multi_rules = MultiPattern(rule_patterns)
+
+
+def separate_scans():
+    return [[rule.findall(line) for rule in compiled_rules] for line in log_lines]
+
+
+def single_scan():
+    return [multi_rules.findall(line) for line in log_lines]
+
+
+assert [list(found.values()) for found in single_scan()] == separate_scans()
+separate_seconds = best_seconds(separate_scans)
+single_seconds = best_seconds(single_scan)
+print(f"  200 x findall()        {separate_seconds * 1e3:8.1f} ms per {len(log_lines)} lines")
+print(f"  MultiPattern.findall() {single_seconds * 1e3:8.1f} ms per {len(log_lines)} lines  ({separate_seconds / single_seconds:.1f}x)")
+print("-" * 30)
+
+# --- 3. Skipping Lines With a Literal Prefilter ---
+# Same log lines, one pattern. Every match contains "ERR-", so a line without
+# it is skipped with a substring check instead of a regex search.
+
+print("\n--- 3. Skipping Lines With a Literal Prefilter ---")
+
+error_pattern = r"\bERR-(\d{3}): (\w+)"
+error_regex = re.compile(error_pattern)
+error_prefiltered = PrefilteredPattern(error_pattern)
+print(f"  Required literals of {error_pattern!r}: {error_prefiltered.literals}")
+
+
+def search_every_line():
+    return [(n, line, match) for n, line in enumerate(log_lines, 1) if (match := error_regex.search(line))]
+
+
+def grep_prefiltered():
+    return list(grep(error_prefiltered, log_lines))
+
+
+assert [(n, match.span()) for n, _, match in search_every_line()] == \
+    [(n, match.span()) for n, _, match in grep_prefiltered()]
+search_seconds = best_seconds(search_every_line)
+grep_seconds = best_seconds(grep_prefiltered)
+print(f"  regex on every line    {search_seconds * 1e3:8.2f} ms per {len(log_lines)} lines")
+print(f"  grep() with prefilter  {grep_seconds * 1e3:8.2f} ms per {len(log_lines)} lines  ({search_seconds / grep_seconds:.1f}x)")
+print("-" * 30)
+
+# --- 4. Searching a File Without Loading It ---
+# A 20 MB log file, searched for error codes: read into memory first, then
+# memory-mapped, then read in 1 MB chunks. Peak memory is what the Python
+# allocator saw during the search (the mapping itself is page cache).
+
+print("\n--- 4. Searching a File Without Loading It ---")
+
+file_lines = [line.encode() + b"\n" for line in log_lines]
+with tempfile.NamedTemporaryFile("wb", suffix=".log", delete=False) as big_file:
+    while big_file.tell() < 20 * 1024 * 1024:
+        big_file.writelines(file_lines)
+big_path = big_file.name
+
+
+def read_then_search():
+    with open(big_path, "rb") as f:
+        return [match.span() for match in re.finditer(rb"ERR-(\d{3})", f.read())]
+
+
+def search_mapped():
+    return [match.span() for match in finditer_file(rb"ERR-(\d{3})", big_path)]
+
+
+def search_chunked():
+    return [match.span() for match in finditer_file(rb"ERR-(\d{3})", big_path, use_mmap=False)]
+
+
+assert read_then_search() == search_mapped() == search_chunked()
+
+# Matches that straddle chunk boundaries: tiny chunks, short random texts
+boundary_patterns = [r"a\w{0,3}z|b", r"(?<=a)b{1,3}", r"\bab?", r"x{0,4}", r"a(?=b_)", r"(?m)^a|b$"]
+for _ in range(3000):
+    text = "".join(random.choice("ab_xz\n") for _ in range(random.randint(0, 30)))
+    chunk_size = random.randint(1, 8)
+    for boundary_pattern in boundary_patterns:
+        expected = [match.span() for match in re.finditer(boundary_pattern, text)]
+        found = [match.span() for match in finditer_file(boundary_pattern, io.StringIO(text),
+                                                         chunk_size=chunk_size, max_match_length=8)]
+        assert found == expected, (boundary_pattern, text, chunk_size)
+for label, search_file in [("read() + finditer", read_then_search), ("mmap", search_mapped),
+                           ("1 MB chunks", search_chunked)]:
+    seconds = best_seconds(search_file)
+    tracemalloc.start()
+    search_file()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print(f"  {label:<22} {seconds * 1e3:8.1f} ms   peak {peak / 1024 / 1024:6.1f} MB")
+os.remove(big_path)
+print("-" * 30)
+
+# --- 5. Extraction Across Processes ---
+# Email/URL/phone extraction over 4000 documents with 1 process, then with
+# pools of 2, 4, ... up to the number of cores. Under the spawn start method
+# pool workers import this module, so this section only runs as a script.
+
+if __name__ == "__main__":
+    print("\n--- 5. Extraction Across Processes ---")
+
+    contacts = ["ops@example.com", "https://status.example.com/incidents/42", "555-010-4477",
+                "sales.team+eu@example.co.uk", "http://example.org/a?b=c"]
+    documents = []
+    for n in range(4000):
+        lines = [" ".join(random.choice(log_words) for _ in range(12)) for _ in range(20)]
+        lines[n % 20] += " contact " + random.choice(contacts)
+        documents.append("\n".join(lines))
+
+    assert extract_all(EXTRACTION_PATTERNS, documents, processes=2, chunksize=100) == \
+        extract_all(EXTRACTION_PATTERNS, documents, processes=1)
+    print(f"  Cores available: {os.cpu_count()}")
+    for processes, seconds, speedup in scaling_curve(EXTRACTION_PATTERNS, documents, chunksize=100):
+        print(f"  {processes:3d} processes  {seconds * 1e3:8.1f} ms per {len(documents)} documents  ({speedup:.1f}x)")
+    print("-" * 30)
+
+# --- 6. Regex Over a Whole Column ---
+# 500,000 log messages in a Series, 5% of them null. The .str methods call
+# the regex once per row; regex_vectorized finds the rows holding "ERR-" in
+# one pass over the joined column and runs the regex only there, and does
+# the whitespace clean-up in one sub() call per batch.
+
+if __name__ == "__main__":
+    print("\n--- 6. Regex Over a Whole Column ---")
+
+    messages = pd.Series([float("nan") if n % 20 == 7 else log_lines[n % len(log_lines)] for n in range(500_000)],
+                         name="message")
+    column_cases = [
+        ("contains", lambda: messages.str.contains(r"\bERR-\d{3}\b", na=False),
+         lambda: regex_vectorized.contains(r"\bERR-\d{3}\b", messages)),
+        ("extract", lambda: messages.str.extract(r"ERR-(?P<code>\d{3}): (\w+)"),
+         lambda: regex_vectorized.extract(r"ERR-(?P<code>\d{3}): (\w+)", messages)),
+        ("sub", lambda: messages.str.replace(r"\s+", "_", regex=True),
+         lambda: regex_vectorized.sub(r"\s+", "_", messages)),
+    ]
+    for label, with_str, vectorized in column_cases:
+        assert with_str().equals(vectorized())
+        str_seconds = best_seconds(with_str)
+        vectorized_seconds = best_seconds(vectorized)
+        print(f"  .str.{label:<9} {str_seconds * 1e3:8.1f} ms   regex_vectorized.{label:<9} "
+              f"{vectorized_seconds * 1e3:8.1f} ms  ({str_seconds / vectorized_seconds:.1f}x)")
+    print("-" * 30)
+
+# --- 7. Field Validators ---
+# 20,000 inbound values per field, a quarter of them valid and the rest other
+# fields' values or free text. re.fullmatch() with the pattern string (looked
+# up in re's cache on every call), the precompiled fullmatch(), and the
+# validator that rejects by length and separators before the regex runs.
+
+if __name__ == "__main__":
+    print("\n--- 7. Field Validators ---")
+
+    field_values = [value for samples in regex_validators._SAMPLES.values() for value in samples] + log_lines[:20]
+    for kind, pattern in regex_validators.PATTERNS.items():
+        assert not regex_validators.fuzz(kind, trials=20000)
+        valid = regex_validators._SAMPLES[kind]
+        records = [valid[n % len(valid)] if n % 4 == 0 else field_values[n % len(field_values)]
+                   for n in range(20000)]
+        compiled_fullmatch = re.compile(pattern).fullmatch
+        validator = regex_validators.VALIDATORS[kind]
+        field_cases = [
+            ("re.fullmatch(str)", lambda: [re.fullmatch(pattern, record) is not None for record in records]),
+            ("compiled fullmatch", lambda: [compiled_fullmatch(record) is not None for record in records]),
+            ("validator", lambda: [validator(record) for record in records]),
+        ]
+        assert field_cases[0][1]() == field_cases[2][1]()
+        timings = [(label, best_seconds(case)) for label, case in field_cases]
+        print(f"  {kind}:")
+        for label, seconds in timings:
+            print(f"    {label:<19} {seconds * 1e3:7.2f} ms  ({timings[0][1] / seconds:.1f}x)")
+    print("-" * 30)
+
+# --- 8. Substitution Templates and Many Replacements ---
+# A template with group references, expanded per match by re.sub() and by a
+# Substitution built once. Then 300 whole-word replacement rules applied to a
+# text one re.sub() after the other, and by a Replacer in one pass.
+
+if __name__ == "__main__":
+    print("\n--- 8. Substitution Templates and Many Replacements ---")
+
+    address_text = " ".join(f"user{n}@host{n % 50}.com wrote {random.choice(log_words)}" for n in range(5000))
+    address_swap = Substitution(r"(\w+)@(\w+)\.com", r"\2 <- \1")
+    template_cases = [
+        ("re.sub(template)", lambda: re.sub(r"(\w+)@(\w+)\.com", r"\2 <- \1", address_text)),
+        ("Substitution.sub", lambda: address_swap.sub(address_text)),
+    ]
+
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    rules = {}
+    while len(rules) < 300:
+        word = "".join(random.choice(letters) for _ in range(random.randint(4, 10)))
+        rules[word] = word.upper()
+    rule_words = list(rules)[:30] + ["".join(random.choice(letters) for _ in range(random.randint(2, 9)))
+                                     for _ in range(2000)]
+    document = " ".join(random.choice(rule_words) for _ in range(20000))
+    replacer = Replacer(rules, whole_words=True)
+
+    def sequential_subs():
+        text = document
+        for word, replacement in rules.items():
+            text = re.sub(rf"\b{word}\b", replacement, text)
+        return text
+
+    rule_cases = [("300 x re.sub", sequential_subs), ("Replacer.sub", lambda: replacer.sub(document))]
+
+    for cases in (template_cases, rule_cases):
+        assert cases[0][1]() == cases[1][1]()
+        (base_label, base), (label, fast) = cases
+        base_seconds = best_seconds(base)
+        fast_seconds = best_seconds(fast)
+        print(f"  {base_label:<18} {base_seconds * 1e3:8.2f} ms")
+        print(f"  {label:<18} {fast_seconds * 1e3:8.2f} ms  ({base_seconds / fast_seconds:.1f}x)")
+    print("-" * 30)
+
+# --- 9. Catastrophic Backtracking and Time Budgets ---
+# lint() over the patterns used in these modules, safe repeated alternations
+# and a few known bad ones.
+# Then (a+)+$ against a run of "a"s that ends in "b": without a guard the time
+# doubles with every extra character; time_limit() and RegexSandbox stop it
+# at the budget. Last, what running a good pattern in the sandbox costs per call.
+
+if __name__ == "__main__":
+    print("\n--- 9. Catastrophic Backtracking and Time Budgets ---")
+
+    checked = list(regex_validators.PATTERNS.values()) + list(EXTRACTION_PATTERNS.values()) + \
+        [r"(?:cat|horse)+", r"(?:\r\n|\n)+", r"(?:ab|c)+$"] + \
+        [r"(a+)+$", r"(\w+\s?)+$", r"(a|aa)*$", r"\d+\d+x", r"(\s*,\s*)*x"]
+    lint_seconds = best_seconds(lambda: [regex_lint.lint(pattern) for pattern in checked])
+    print(f"  lint() of {len(checked)} patterns: {lint_seconds * 1e3:.2f} ms")
+    for pattern in checked:
+        findings = regex_lint.lint(pattern)
+        print(f"    {pattern[:40]:<40} {', '.join(f'{f.kind} ({f.severity})' for f in findings) or 'ok'}")
+
+    evil = re.compile(r"(a+)+$")
+    for length in (16, 18, 20, 22):
+        seconds = best_seconds(lambda: evil.match("a" * length + "b"), number=1)
+        print(f"  (a+)+$ on {length + 1} chars, unguarded: {seconds * 1e3:9.1f} ms")
+
+    budget = 0.05
+    started = timeit.default_timer()
+    try:
+        with regex_lint.time_limit(budget):
+            evil.match("a" * 40 + "b")
+    except TimeoutError:
+        pass
+    print(f"  (a+)+$ on 41 chars, time_limit({budget}): stopped after {(timeit.default_timer() - started) * 1e3:.1f} ms")
+
+    with regex_lint.RegexSandbox(timeout=budget) as sandbox:
+        sandbox.search(r"\d", "warm up") # Starts the helper process
+        started = timeit.default_timer()
+        try:
+            sandbox.match(r"(a+)+$", "a" * 40 + "b")
+        except TimeoutError:
+            pass
+        print(f"  (a+)+$ on 41 chars, RegexSandbox: stopped after {(timeit.default_timer() - started) * 1e3:.1f} ms")
+        sandbox.search(r"\d", "warm up") # Restarts it
+        line = log_lines[0]
+        direct = best_seconds(lambda: re.search(r"\d+", line), number=1000) / 1000
+        boxed = best_seconds(lambda: sandbox.search(r"\d+", line), number=1000) / 1000
+        print(f"  re.search:          {direct * 1e6:8.2f} us per call")
+        print(f"  RegexSandbox.search {boxed * 1e6:8.2f} us per call")
+    print("-" * 30)
@@ -0,0 +1,166 @@
+import collections
+import re
+import threading
+import time
+
+# --- Compiled pattern cache ---
+# re.search(pattern, text) and friends look the pattern up in re's internal
+# cache and compile it on a miss. That cache holds 512 patterns (CPython 3.11)
+# and, once full, evicts the oldest entry no matter how often it is used, so a
+# job cycling through a few hundred patterns x flags can miss on every call.
+#
+# PatternCache is an LRU of compiled patterns with a configurable capacity and
+# hit/miss/compile-time counters. The module-level functions (search, findall,
+# sub, ...) mirror the re functions on top of a shared default cache:
+#
+#   import regex_cache
+#   regex_cache.warm(LOG_PATTERNS)           # compile the known set at startup
+#   regex_cache.findall(r"\d+", line)
+#   regex_cache.cache_stats()
+
+DEFAULT_CAPACITY = 4096
+
+
+class PatternCache:
+    """LRU cache of compiled regular expressions with hit/miss statistics."""
+
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        self.capacity = capacity
+        self._patterns = collections.OrderedDict() # (type, pattern, flags) -> re.Pattern
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.compile_seconds = 0.0
+
+    def compile(self, pattern, flags=0):
+        """Same as re.compile(), but served from this cache."""
+        if isinstance(pattern, re.Pattern):
+            if flags:
+                raise ValueError("cannot process flags argument with a compiled pattern")
+            return pattern
+        key = (type(pattern), pattern, int(flags))
+        with self._lock:
+            compiled = self._patterns.get(key)
+            if compiled is not None:
+                self._patterns.move_to_end(key)
+                self.hits += 1
+                return compiled
+            self.misses += 1
+        # Compile outside the lock; two threads may both compile a new pattern once
+        started = time.perf_counter()
+        compiled = re.compile(pattern, flags)
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self.compile_seconds += elapsed
+            self._patterns[key] = compiled
+            self._evict()
+        return compiled
+
+    def _evict(self):
+        # Caller holds self._lock
+        while len(self._patterns) > self.capacity:
+            self._patterns.popitem(last=False)
+            self.evictions += 1
+
+    def resize(self, capacity):
+        """Changes the capacity, evicting the least recently used patterns if needed."""
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        with self._lock:
+            self.capacity = capacity
+            self._evict()
+
+    def warm(self, patterns):
+        """Compiles `patterns` (strings or (pattern, flags) pairs) ahead of use.
+
+        Returns how many were not cached yet. Raises re.error for the first
+        invalid pattern, so a bad rule set fails at startup.
+        """
+        compiled = 0
+        for pattern in patterns:
+            pattern, flags = pattern if isinstance(pattern, tuple) else (pattern, 0)
+            misses = self.misses
+            self.compile(pattern, flags)
+            compiled += self.misses != misses
+        return compiled
+
+    def clear(self):
+        with self._lock:
+            self._patterns.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._patterns),
+                "capacity": self.capacity,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "compile_seconds": self.compile_seconds,
+            }
+
+    def __len__(self):
+        return len(self._patterns)
+
+
+# --- re-style functions over a shared cache ---
+
+_default_cache = PatternCache()
+
+
+def get_pattern_cache():
+    return _default_cache
+
+
+def get_pattern(pattern, flags=0):
+    """re.compile() through the shared cache."""
+    return _default_cache.compile(pattern, flags)
+
+
+def warm(patterns):
+    return _default_cache.warm(patterns)
+
+
+def set_capacity(capacity):
+    _default_cache.resize(capacity)
+
+
+def cache_stats():
+    return _default_cache.stats()
+
+
+def match(pattern, string, flags=0):
+    return _default_cache.compile(pattern, flags).match(string)
+
+
+def fullmatch(pattern, string, flags=0):
+    return _default_cache.compile(pattern, flags).fullmatch(string)
+
+
+def search(pattern, string, flags=0):
+    return _default_cache.compile(pattern, flags).search(string)
+
+
+def findall(pattern, string, flags=0):
+    return _default_cache.compile(pattern, flags).findall(string)
+
+
+def finditer(pattern, string, flags=0):
+    return _default_cache.compile(pattern, flags).finditer(string)
+
+
+def sub(pattern, repl, string, count=0, flags=0):
+    return _default_cache.compile(pattern, flags).sub(repl, string, count)
+
+
+def subn(pattern, repl, string, count=0, flags=0):
+    return _default_cache.compile(pattern, flags).subn(repl, string, count)
+
+
+def split(pattern, string, maxsplit=0, flags=0):
+    return _default_cache.compile(pattern, flags).split(string, maxsplit)
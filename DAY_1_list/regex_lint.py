@@ -0,0 +1,499 @@
+import contextlib
+import multiprocessing
+import re
+import signal
+import threading
+
+from regex_cache import get_pattern
+from regex_parse import ATOMIC_GROUP, REPEATS, sre_parse
+
+# --- Catastrophic backtracking: lint before compile, guard at run time ---
+# re is a backtracking engine. When a pattern can match the same text in many
+# different ways, a failing match tries all of them:
+#
+#   (a+)+$   on "aaaa...ab"   2**n ways to split the a's between the two +
+#   (a|aa)*$ on "aaaa...ab"   a Fibonacci number of ways
+#   \d+\d+x  on "1111...1"    n**2 ways (adjacent repeats eating the same chars)
+#
+# lint() reads the parsed pattern and reports those shapes:
+#   * nested-quantifier     a repeat inside a repeat with nothing between the
+#                           iterations that the inner repeat can't also match
+#   * overlapping-alternation  alternatives under a repeat that can start the
+#                           same text (one's text can begin another's)
+#   * adjacent-quantifiers  two repeats in a row that can eat the same chars
+# The first two are exponential, the last polynomial; so is a nested repeat
+# under a bounded one, like (.*a){12}. Atomic groups (?>...)
+# and possessive repeats (a++), Python 3.11+, can't backtrack and are not
+# reported. The checks are heuristics over character sets; they can flag a
+# harmless pattern now and then, not the other way round for these shapes.
+#
+# Patterns that must run anyway get a time budget, as re has no step counter:
+#   * time_limit(seconds): SIGALRM interrupts the regex in the middle (the
+#     engine checks for signals as it goes). Main thread, Unix only.
+#   * RegexSandbox: runs the regex in a helper process and kills it when the
+#     budget runs out. Any thread and platform, but every call pickles its
+#     text and result.
+
+# Characters used to compare character sets: Latin-1 plus a few other scripts
+_SAMPLE = [chr(code) for code in range(256)] + ["ā", "я", "中", "١", " ", " "]
+_ANY = frozenset(_SAMPLE)
+_CATEGORIES = {
+    sre_parse.CATEGORY_DIGIT: str.isdecimal,
+    sre_parse.CATEGORY_SPACE: str.isspace,
+    sre_parse.CATEGORY_WORD: lambda char: char.isalnum() or char == "_",
+}
+_NOT_CATEGORIES = {
+    sre_parse.CATEGORY_NOT_DIGIT: sre_parse.CATEGORY_DIGIT,
+    sre_parse.CATEGORY_NOT_SPACE: sre_parse.CATEGORY_SPACE,
+    sre_parse.CATEGORY_NOT_WORD: sre_parse.CATEGORY_WORD,
+}
+
+
+class Finding:
+    """One problem lint() found: kind, severity ("exponential" or "polynomial") and message."""
+
+    __slots__ = ("kind", "severity", "message")
+
+    def __init__(self, kind, severity, message):
+        self.kind = kind
+        self.severity = severity
+        self.message = message
+
+    def __repr__(self):
+        return f"<Finding {self.kind} ({self.severity}): {self.message}>"
+
+
+def _category_chars(category):
+    if category in _NOT_CATEGORIES:
+        return _ANY - _category_chars(_NOT_CATEGORIES[category])
+    test = _CATEGORIES.get(category)
+    return _ANY if test is None else frozenset(char for char in _SAMPLE if test(char))
+
+
+def _class_chars(items):
+    chars = set()
+    negate = False
+    for op, av in items:
+        if op is sre_parse.NEGATE:
+            negate = True
+        elif op is sre_parse.LITERAL:
+            chars.add(chr(av))
+        elif op is sre_parse.RANGE:
+            chars.update(char for char in _SAMPLE if av[0] <= ord(char) <= av[1])
+        elif op is sre_parse.CATEGORY:
+            chars |= _category_chars(av)
+        else:
+            return _ANY
+    return _ANY - chars if negate else frozenset(chars)
+
+
+def _item_chars(op, av, flags):
+    # Characters a one-character item matches, or None for other items
+    if op is sre_parse.LITERAL:
+        chars = frozenset((chr(av),))
+    elif op is sre_parse.NOT_LITERAL:
+        chars = _ANY - {chr(av)}
+    elif op is sre_parse.ANY:
+        chars = _ANY if flags & re.DOTALL else _ANY - {"\n"}
+    elif op is sre_parse.IN:
+        chars = _class_chars(av)
+    else:
+        return None
+    if flags & re.IGNORECASE:
+        chars = chars | {char.swapcase() for char in chars}
+    return chars
+
+
+def _consumed(sequence, flags):
+    """Every character some part of the sequence can match."""
+    chars = set()
+    for op, av in sequence:
+        item = _item_chars(op, av, flags)
+        if item is not None:
+            chars |= item
+        elif op is sre_parse.SUBPATTERN:
+            chars |= _consumed(av[3], _scoped(flags, av))
+        elif op is sre_parse.BRANCH:
+            for branch in av[1]:
+                chars |= _consumed(branch, flags)
+        elif op in REPEATS:
+            chars |= _consumed(av[2], flags)
+        elif op is ATOMIC_GROUP:
+            chars |= _consumed(av, flags)
+        elif op is sre_parse.GROUPREF:
+            return _ANY # Whatever the group matched
+    return frozenset(chars)
+
+
+def _min_width(sequence, item):
+    return sre_parse.SubPattern(sequence.state, [item]).getwidth()[0]
+
+
+def _scoped(flags, av):
+    # Flags inside a (?flags:...) group
+    _, add_flags, del_flags, _ = av
+    return (flags | add_flags) & ~del_flags
+
+
+def _edge(sequence, flags, last=False):
+    """Characters a match of the sequence can start (or with last=True, end) with."""
+    chars = set()
+    for op, av in reversed(sequence) if last else sequence:
+        item = _item_chars(op, av, flags)
+        if item is not None:
+            return chars | item
+        if op in (sre_parse.AT, sre_parse.ASSERT, sre_parse.ASSERT_NOT):
+            continue
+        if op is sre_parse.SUBPATTERN:
+            chars |= _edge(av[3], _scoped(flags, av), last)
+        elif op is sre_parse.BRANCH:
+            for branch in av[1]:
+                chars |= _edge(branch, flags, last)
+        elif op in REPEATS:
+            chars |= _edge(av[2], flags, last)
+        elif op is ATOMIC_GROUP:
+            chars |= _edge(av, flags, last)
+        else:
+            return _ANY
+        if _min_width(sequence, (op, av)) > 0:
+            break
+    return chars
+
+
+def _plain_prefix(sequence, flags):
+    # Per-position character sets of the leading one-character items
+    positions = []
+    for op, av in sequence:
+        chars = _item_chars(op, av, flags)
+        if chars is None:
+            break
+        positions.append(chars)
+    return positions
+
+
+def _can_start_alike(first, second, flags):
+    # Can one alternative's text be the start of the other's?
+    first_prefix = _plain_prefix(first, flags)
+    second_prefix = _plain_prefix(second, flags)
+    if not first_prefix or not second_prefix:
+        if first.getwidth()[0] == 0 and second.getwidth()[0] == 0:
+            return True # Both can match the empty string
+        return bool(_edge(first, flags) & _edge(second, flags))
+    for chars, other in zip(first_prefix, second_prefix):
+        if not chars & other:
+            return False
+    return True # Ran out of items before telling them apart
+
+
+def _variable_repeats(sequence, flags, guards):
+    """(chars it consumes, chars of the mandatory items around it, what it is) for
+    every repeat, and every alternation with an optional or overlapping
+    alternative, in the sequence that can backtrack."""
+    for index, (op, av) in enumerate(sequence):
+        siblings = [_consumed([item], flags) for position, item in enumerate(sequence)
+                    if position != index and _min_width(sequence, item) > 0]
+        around = guards + siblings
+        if op in (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT):
+            low, high, body = av
+            if high != low and body.getwidth()[1] > 0:
+                yield _consumed(body, flags), around, "a repeat"
+            yield from _variable_repeats(body, flags, around)
+        elif op is sre_parse.SUBPATTERN:
+            yield from _variable_repeats(av[3], _scoped(flags, av), around)
+        elif op is sre_parse.BRANCH:
+            # sre_parse turns a|aa into a(?:|a): an empty alternative is an
+            # optional part. Alternatives of different lengths that start
+            # differently, like cat|horse, pick one way to match and are left out.
+            branches = av[1]
+            if any(branch.getwidth()[0] == 0 for branch in branches) or any(
+                    _can_start_alike(branches[first], second, flags)
+                    for first in range(len(branches)) for second in branches[first + 1:]):
+                yield _consumed([(op, av)], flags), around, "an alternation"
+            for branch in branches:
+                yield from _variable_repeats(branch, flags, around)
+
+
+def _describe(body):
+    return f"group {body[0][1][0]}" if len(body) == 1 and body[0][0] is sre_parse.SUBPATTERN \
+        and body[0][1][0] is not None else "a repeated part"
+
+
+def _lint_repeat(body, flags, findings, unbounded):
+    where = _describe(body)
+    limit, severity = ("without limit", "exponential") if unbounded else ("many times", "polynomial")
+    if unbounded and body.getwidth()[0] == 0:
+        findings.append(Finding("nested-quantifier", severity,
+                                f"{where} is repeated without limit but can match the empty string"))
+        return
+    for chars, around, inner in _variable_repeats(body, flags, []):
+        if chars and all(guard & chars for guard in around):
+            fix = "make the inner repeat possessive (a++) or" if inner == "a repeat" else "make"
+            findings.append(Finding(
+                "nested-quantifier", severity,
+                f"{where} is repeated {limit} and contains {inner} that can split the same text "
+                f"in several ways; {fix} the group atomic (?>...)"))
+            return
+    # One repetition's end can trade characters with the next one's start: (\s*,\s*)*
+    while len(body) == 1 and body[0][0] is sre_parse.SUBPATTERN:
+        flags = _scoped(flags, body[0][1])
+        body = body[0][1][3]
+    if _adjacent(sre_parse.SubPattern(body.state, list(body) + list(body)), flags) and not _adjacent(body, flags):
+        findings.append(Finding(
+            "nested-quantifier", severity,
+            f"{where} is repeated {limit} and the end of one repetition can match the same "
+            "characters as the start of the next"))
+
+
+def _lint_alternations(sequence, flags, findings):
+    # Overlapping alternatives anywhere under an unbounded repeat
+    for op, av in sequence:
+        if op is sre_parse.BRANCH:
+            branches = av[1]
+            for first in range(len(branches)):
+                for second in range(first + 1, len(branches)):
+                    if _can_start_alike(branches[first], branches[second], flags):
+                        findings.append(Finding(
+                            "overlapping-alternation", "exponential",
+                            f"alternatives {first + 1} and {second + 1} of an alternation under a repeat "
+                            "can match the same start; make them exclusive or the group atomic"))
+                        return
+            for branch in branches:
+                _lint_alternations(branch, flags, findings)
+        elif op is sre_parse.SUBPATTERN:
+            _lint_alternations(av[3], _scoped(flags, av), findings)
+        elif op in (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT):
+            _lint_alternations(av[2], flags, findings)
+
+
+def _adjacent(sequence, flags):
+    # True if two unbounded repeats in the sequence can divide a run of characters between them
+    previous = set() # What the unbounded repeats since the last mandatory item can end with
+    for op, av in sequence:
+        if op in (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT) and av[1] is sre_parse.MAXREPEAT:
+            if previous & _edge(av[2], flags):
+                return True
+            if _min_width(sequence, (op, av)) > 0:
+                previous = set() # Nothing before it is next to what follows
+            previous |= _edge(av[2], flags, last=True)
+        elif op is sre_parse.AT or _min_width(sequence, (op, av)) > 0:
+            previous = set()
+    return False
+
+
+def _lint(sequence, flags, findings):
+    if _adjacent(sequence, flags):
+        findings.append(Finding(
+            "adjacent-quantifiers", "polynomial",
+            "two unbounded repeats in a row can match the same characters; "
+            "a failing match tries every way to divide the text between them"))
+    for op, av in sequence:
+        if op in (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT):
+            low, high, body = av
+            if high is sre_parse.MAXREPEAT:
+                _lint_repeat(body, flags, findings, unbounded=True)
+                _lint_alternations(body, flags, findings)
+            elif high > 1:
+                _lint_repeat(body, flags, findings, unbounded=False)
+            _lint(body, flags, findings)
+        elif op is sre_parse.SUBPATTERN:
+            _lint(av[3], _scoped(flags, av), findings)
+        elif op is sre_parse.BRANCH:
+            for branch in av[1]:
+                _lint(branch, flags, findings)
+        elif op in (sre_parse.ASSERT, sre_parse.ASSERT_NOT):
+            _lint(av[1], flags, findings)
+        elif op is sre_parse.GROUPREF_EXISTS:
+            _, yes, no = av
+            _lint(yes, flags, findings)
+            if no is not None:
+                _lint(no, flags, findings)
+        # Atomic groups and possessive repeats don't backtrack into themselves
+
+
+def lint(pattern, flags=0):
+    """Returns a list of Findings for shapes in `pattern` that can backtrack catastrophically.
+
+    Raises re.error if the pattern doesn't compile.
+    """
+    compiled = get_pattern(pattern, flags)
+    source = compiled.pattern
+    if isinstance(source, bytes):
+        source = source.decode("latin-1")
+    parsed = sre_parse.parse(source, compiled.flags & ~re.LOCALE)
+    findings = []
+    _lint(parsed, compiled.flags, findings)
+    return findings
+
+
+def safe_compile(pattern, flags=0):
+    """Compiles `pattern`, raising ValueError if lint() finds exponential backtracking."""
+    exponential = [finding for finding in lint(pattern, flags) if finding.severity == "exponential"]
+    if exponential:
+        raise ValueError(f"{pattern!r} can backtrack exponentially: {exponential[0].message}")
+    return get_pattern(pattern, flags)
+
+
+# --- Time budgets ---
+
+@contextlib.contextmanager
+def time_limit(seconds):
+    """Raises TimeoutError inside the with-block after `seconds`, even in the middle of a regex.
+
+    Uses SIGALRM, so only in the main thread on Unix; elsewhere use RegexSandbox.
+    """
+    if not hasattr(signal, "setitimer") or threading.current_thread() is not threading.main_thread():
+        raise RuntimeError("time_limit() needs SIGALRM in the main thread; use RegexSandbox")
+
+    def expired(signum, frame):
+        raise TimeoutError(f"regex ran longer than {seconds}s")
+
+    previous = signal.signal(signal.SIGALRM, expired)
+    signal.setitimer(signal.ITIMER_REAL, seconds)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+
+class SandboxMatch:
+    """The parts of a match object that came back from a RegexSandbox."""
+
+    __slots__ = ("_values", "_spans", "_names")
+
+    def __init__(self, match):
+        count = match.re.groups + 1
+        self._values = [match.group(group) for group in range(count)]
+        self._spans = [match.span(group) for group in range(count)]
+        self._names = dict(match.re.groupindex)
+
+    def _index(self, group):
+        return self._names[group] if isinstance(group, str) else group
+
+    def group(self, *groups):
+        if len(groups) <= 1:
+            return self._values[self._index(groups[0] if groups else 0)]
+        return tuple(self._values[self._index(group)] for group in groups)
+
+    def __getitem__(self, group):
+        return self.group(group)
+
+    def groups(self, default=None):
+        return tuple(default if value is None else value for value in self._values[1:])
+
+    def groupdict(self, default=None):
+        return {name: default if self._values[index] is None else self._values[index]
+                for name, index in self._names.items()}
+
+    def span(self, group=0):
+        return self._spans[self._index(group)]
+
+    def start(self, group=0):
+        return self.span(group)[0]
+
+    def end(self, group=0):
+        return self.span(group)[1]
+
+    def __repr__(self):
+        return f"<SandboxMatch span={self.span()!r}, match={self.group()!r}>"
+
+
+_MATCH_METHODS = {"search", "match", "fullmatch"}
+_SANDBOX_METHODS = _MATCH_METHODS | {"findall", "split", "sub", "subn"}
+
+
+def _sandbox_main(connection):
+    while True:
+        try:
+            request = connection.recv()
+        except EOFError:
+            return
+        method, pattern, flags, args = request
+        try:
+            result = getattr(get_pattern(pattern, flags), method)(*args)
+            if method in _MATCH_METHODS and result is not None:
+                result = SandboxMatch(result)
+            reply = ("ok", result)
+        except Exception as e:
+            reply = ("error", e)
+        try:
+            connection.send(reply)
+        except Exception as e: # An exception that doesn't pickle
+            connection.send(("error", RuntimeError(repr(e))))
+
+
+class RegexSandbox:
+    """Runs regex calls in a helper process and kills it when one runs over `timeout`.
+
+    search()/match()/fullmatch() return a SandboxMatch or None; findall(),
+    split(), sub() and subn() return what re does (sub() takes a template,
+    not a function). An overrun raises TimeoutError and the next call starts
+    a fresh process.
+    """
+
+    def __init__(self, timeout=1.0, context=None):
+        self.timeout = timeout
+        self._context = context or multiprocessing.get_context()
+        self._process = None
+        self._connection = None
+        self._lock = threading.Lock()
+
+    def _start(self):
+        self._connection, child = self._context.Pipe()
+        self._process = self._context.Process(target=_sandbox_main, args=(child,), daemon=True)
+        self._process.start()
+        child.close()
+
+    def _kill(self):
+        self._process.kill()
+        self._process.join()
+        self._connection.close()
+        self._process = self._connection = None
+
+    def call(self, method, pattern, *args, flags=0, timeout=None):
+        """getattr(re.compile(pattern, flags), method)(*args), within the time budget."""
+        if method not in _SANDBOX_METHODS:
+            raise ValueError(f"Unsupported method: {method!r}")
+        timeout = self.timeout if timeout is None else timeout
+        with self._lock:
+            if self._process is None:
+                self._start()
+            self._connection.send((method, pattern, flags, args))
+            if not self._connection.poll(timeout):
+                self._kill()
+                raise TimeoutError(f"regex {method}() ran longer than {timeout}s")
+            status, result = self._connection.recv()
+        if status == "error":
+            raise result
+        return result
+
+    def search(self, pattern, string, flags=0, timeout=None):
+        return self.call("search", pattern, string, flags=flags, timeout=timeout)
+
+    def match(self, pattern, string, flags=0, timeout=None):
+        return self.call("match", pattern, string, flags=flags, timeout=timeout)
+
+    def fullmatch(self, pattern, string, flags=0, timeout=None):
+        return self.call("fullmatch", pattern, string, flags=flags, timeout=timeout)
+
+    def findall(self, pattern, string, flags=0, timeout=None):
+        return self.call("findall", pattern, string, flags=flags, timeout=timeout)
+
+    def sub(self, pattern, repl, string, count=0, flags=0, timeout=None):
+        return self.call("sub", pattern, repl, string, count, flags=flags, timeout=timeout)
+
+    def close(self):
+        with self._lock:
+            if self._process is not None:
+                self._connection.close() # The helper sees EOF and exits
+                self._process.join(1)
+                if self._process.is_alive():
+                    self._process.kill()
+                    self._process.join()
+                self._process = self._connection = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
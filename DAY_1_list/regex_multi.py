@@ -0,0 +1,320 @@
+import heapq
+import re
+
+from regex_cache import get_pattern
+from regex_parse import ATOMIC_GROUP, REPEATS, parse, sre_parse
+from regex_prefilter import LiteralSet, required_literals
+
+# --- Many patterns, one scan ---
+# Running N patterns over a line with N findall() calls scans the line N
+# times. MultiPattern joins the patterns into one alternation,
+#   (p0)|(p1)|(p2)|...
+# and uses it only to *locate* positions where some pattern matches. The
+# first alternative that matches there (m.lastindex) tells which patterns
+# can't match at that position; the remaining ones are tried anchored at it
+# with their own compiled pattern. Positions where nothing matches, i.e.
+# almost all of them, are skipped in one pass by the regex engine.
+#
+# Every pattern gets exactly the matches its own finditer() would give (same
+# spans, same groups, non-overlapping per pattern). Patterns can overlap each
+# other, as they would in separate scans.
+#
+# The regex engine tries every alternative at every position, so a bare
+# alternation of 200 patterns is much slower than 200 scans that each skip
+# ahead to their own first character. The alternation is therefore prefixed
+# with a lookahead for the characters any pattern can start with, e.g.
+# (?=[EW])(?:...), when that set can be worked out from the parsed patterns.
+#
+# Before any of that, the literals each pattern requires (regex_prefilter)
+# are looked up in the text in one go. A text without any of them is skipped,
+# and patterns whose literals are missing are not tried.
+#
+# A pattern whose meaning changes inside a bigger regex stays separate and is
+# scanned on its own: numbered backreferences (\1, (?(1)...)) would point at
+# the wrong group, and named groups would clash with other patterns' names.
+
+_INLINE_FLAGS = re.compile(r"\(\?([aiLmsux]+)\)")
+_ESCAPE_OR_CONDITIONAL = re.compile(r"\\(.)|\(\?\((\d)", re.S)
+_SCOPED_FLAGS = ((re.IGNORECASE, "i"), (re.MULTILINE, "m"), (re.DOTALL, "s"),
+                 (re.VERBOSE, "x"), (re.ASCII, "a"))
+
+
+def _uses_group_numbers(source):
+    for escape in _ESCAPE_OR_CONDITIONAL.finditer(source):
+        if escape.group(2) is not None or escape.group(1) in "123456789":
+            return True # Inside [...] \1 is an octal escape; staying separate is still correct
+    return False
+
+
+def _alternative(compiled):
+    # Pattern text that means the same inside (...)|(...) as on its own
+    source = compiled.pattern
+    leading = _INLINE_FLAGS.match(source)
+    if leading:
+        source = source[leading.end():] # Its flags are in compiled.flags already
+    letters = "".join(letter for flag, letter in _SCOPED_FLAGS if compiled.flags & flag)
+    if compiled.flags & re.VERBOSE:
+        source += "\n" # A trailing "# comment" must not swallow the closing parenthesis
+    return f"(?{letters}:{source})" if letters else source
+
+
+_CATEGORY_ESCAPES = {
+    sre_parse.CATEGORY_DIGIT: r"\d", sre_parse.CATEGORY_NOT_DIGIT: r"\D",
+    sre_parse.CATEGORY_WORD: r"\w", sre_parse.CATEGORY_NOT_WORD: r"\W",
+    sre_parse.CATEGORY_SPACE: r"\s", sre_parse.CATEGORY_NOT_SPACE: r"\S",
+}
+_ZERO_WIDTH = {sre_parse.AT, sre_parse.ASSERT, sre_parse.ASSERT_NOT}
+
+
+def _class_body(items):
+    # Source of a [...] class for a parsed IN node, or None
+    negate = items and items[0][0] is sre_parse.NEGATE
+    body = []
+    for op, av in items[1:] if negate else items:
+        if op is sre_parse.LITERAL:
+            body.append(re.escape(chr(av)))
+        elif op is sre_parse.RANGE:
+            body.append(f"{re.escape(chr(av[0]))}-{re.escape(chr(av[1]))}")
+        elif op is sre_parse.CATEGORY and av in _CATEGORY_ESCAPES:
+            body.append(_CATEGORY_ESCAPES[av])
+        else:
+            return None, False
+    return "".join(body), negate
+
+
+def _scoped_chars(chars, flags):
+    # `chars` with the flags that change what they match: (?i:...), and
+    # (?a:...) for \d, \w, \s and their negations
+    letters = "i" if flags & re.IGNORECASE else ""
+    scoped = set()
+    for char in chars:
+        ascii_only = flags & re.ASCII and any(escape in char for escape in _CATEGORY_ESCAPES.values())
+        char_letters = letters + ("a" if ascii_only else "")
+        scoped.add(f"(?{char_letters}:{char})" if char_letters else char)
+    return scoped
+
+
+def _first_chars(sequence):
+    """(set of one-character regexes, can match empty) for a parsed pattern.
+
+    The set may match more than the pattern can start with, never less.
+    Returns (None, True) when any character could come first.
+    """
+    first = set()
+    for op, av in sequence:
+        if op in _ZERO_WIDTH:
+            continue # Assertions only narrow things down; ignoring them stays safe
+        if op is sre_parse.LITERAL:
+            item, nullable = {re.escape(chr(av))}, False
+        elif op is sre_parse.NOT_LITERAL:
+            item, nullable = {f"[^{re.escape(chr(av))}]"}, False
+        elif op is sre_parse.IN:
+            body, negate = _class_body(av)
+            if body is None:
+                return None, True
+            item, nullable = {f"[^{body}]" if negate else f"[{body}]"}, False
+        elif op is sre_parse.SUBPATTERN:
+            _, add_flags, _, subpattern = av
+            item, nullable = _first_chars(subpattern)
+            if item is not None:
+                item = _scoped_chars(item, add_flags)
+        elif op is sre_parse.BRANCH:
+            item, nullable = set(), False
+            for branch in av[1]:
+                branch_first, branch_nullable = _first_chars(branch)
+                if branch_first is None:
+                    return None, True
+                item |= branch_first
+                nullable = nullable or branch_nullable
+        elif op in REPEATS:
+            item, nullable = _first_chars(av[2])
+            nullable = nullable or av[0] == 0
+        elif op is ATOMIC_GROUP:
+            item, nullable = _first_chars(av)
+        else:
+            return None, True # ANY, group references, ...
+        if item is None:
+            return None, True
+        first |= item
+        if not nullable:
+            return first, False
+    return first, True
+
+
+def _first_char_lookahead(compiled_patterns):
+    # "(?=...)" matching any character one of the patterns can start with, or ""
+    plain, other = [], set()
+    for compiled in compiled_patterns:
+        if compiled.flags & re.LOCALE:
+            return ""
+        parsed = parse(compiled.pattern, compiled.flags)
+        if parsed is None:
+            return ""
+        first, nullable = _first_chars(parsed)
+        if first is None or nullable:
+            return "" # Can match at any position, nothing to skip
+        for char in _scoped_chars(first, compiled.flags):
+            if char.startswith("[") and not char.startswith("[^"):
+                plain.append(char[1:-1])
+            elif not char.startswith(("[", "(")):
+                plain.append(char)
+            else:
+                other.add(char)
+    alternatives = sorted(other)
+    if plain:
+        alternatives.insert(0, f"[{''.join(sorted(set(plain)))}]")
+    return f"(?={'|'.join(alternatives)})"
+
+
+def findall_value(match):
+    # What re.findall() would have put in its list for this match
+    if match.re.groups == 0:
+        return match.group()
+    if match.re.groups == 1:
+        return match.group(1)
+    return match.groups(default="")
+
+
+class MultiPattern:
+    """A named set of patterns that is searched with a single scan of the text.
+
+    `patterns` maps a name to a pattern string, a (pattern, flags) pair or a
+    compiled pattern. Results come in text order, tagged with the name.
+    """
+
+    def __init__(self, patterns, flags=0):
+        self.names = []
+        self.patterns = [] # compiled, same order as names
+        for name, pattern in patterns.items():
+            pattern, pattern_flags = pattern if isinstance(pattern, tuple) else (pattern, flags)
+            if isinstance(pattern, re.Pattern):
+                pattern_flags = 0
+            self.names.append(name)
+            self.patterns.append(get_pattern(pattern, pattern_flags))
+        self.literals = [required_literals(compiled) for compiled in self.patterns]
+        self.separate = []   # indexes of patterns scanned on their own
+        self._combined = []  # indexes of patterns in the alternation, in order
+        self.combined = self._build()
+        self._build_prefilter()
+
+    def _build(self):
+        alternatives = []
+        group_names = set()
+        for index, compiled in enumerate(self.patterns):
+            if (not isinstance(compiled.pattern, str) or _uses_group_numbers(compiled.pattern)
+                    or group_names & compiled.groupindex.keys()):
+                self.separate.append(index)
+                continue
+            group_names.update(compiled.groupindex)
+            alternatives.append(_alternative(compiled))
+            self._combined.append(index)
+        if not alternatives:
+            return None
+        lookahead = _first_char_lookahead(self.patterns[index] for index in self._combined)
+        try:
+            combined = re.compile(lookahead + "(?:" + "|".join(f"({alternative})" for alternative in alternatives) + ")")
+        except re.error:
+            # Some construct this module doesn't know about; keep the exact behaviour
+            self.separate = list(range(len(self.patterns)))
+            self._combined = []
+            return None
+        # Outer group number -> position in self._combined
+        self._alternative_at = {}
+        group = 1
+        for position, index in enumerate(self._combined):
+            self._alternative_at[group] = position
+            group += 1 + self.patterns[index].groups
+        return combined
+
+    def _build_prefilter(self):
+        self._unfiltered = set()  # positions in self._combined without required literals
+        self._literal_owners = {} # literal -> positions in self._combined that require it
+        for position, index in enumerate(self._combined):
+            if not self.literals[index]:
+                self._unfiltered.add(position)
+            for literal in self.literals[index]:
+                self._literal_owners.setdefault(literal, set()).add(position)
+        self._literal_set = LiteralSet(self._literal_owners) if self._literal_owners else None
+
+    def _candidates(self, text):
+        # Positions in self._combined that may match `text`, or None for all of them
+        if self._literal_set is None:
+            return None
+        candidates = set(self._unfiltered)
+        for literal in self._literal_set.present(text):
+            candidates.update(self._literal_owners[literal])
+        return candidates
+
+    def _combined_matches(self, text, pos, endpos):
+        # (start, pattern index, match) for every combined pattern, in text order
+        combined = self.combined
+        patterns = self.patterns
+        indexes = self._combined
+        candidates = self._candidates(text)
+        if candidates is not None and not candidates:
+            return
+        next_allowed = [pos] * len(indexes) # finditer() of one pattern never overlaps itself
+        while pos <= endpos:
+            located = combined.search(text, pos, endpos)
+            if located is None:
+                return
+            start = located.start()
+            # Alternatives before the one that matched can't match here
+            for position in range(self._alternative_at[located.lastindex], len(indexes)):
+                if next_allowed[position] > start or candidates is not None and position not in candidates:
+                    continue
+                index = indexes[position]
+                match = patterns[index].match(text, start, endpos)
+                if match is None:
+                    continue
+                next_allowed[position] = match.end()
+                yield start, index, match
+                if match.end() == start:
+                    # After an empty match finditer() may still find a non-empty one here
+                    following = self._after_empty_match(index, text, start, endpos)
+                    next_allowed[position] = start + 1
+                    if following is not None:
+                        next_allowed[position] = following.end()
+                        yield start, index, following
+            pos = start + 1
+
+    def _after_empty_match(self, index, text, start, endpos):
+        matches = self.patterns[index].finditer(text, start, endpos)
+        next(matches)
+        following = next(matches, None)
+        return following if following is not None and following.start() == start else None
+
+    def _separate_matches(self, index, text, pos, endpos):
+        literals = self.literals[index]
+        if literals and not any(literal in text for literal in literals):
+            return
+        for match in self.patterns[index].finditer(text, pos, endpos):
+            yield match.start(), index, match
+
+    def finditer(self, text, pos=0, endpos=None):
+        """Yields (name, match) for every match of every pattern, in text order."""
+        endpos = len(text) if endpos is None else endpos
+        streams = [self._separate_matches(index, text, pos, endpos) for index in self.separate]
+        if self.combined is not None:
+            streams.append(self._combined_matches(text, pos, endpos))
+        if not streams:
+            return
+        merged = streams[0] if len(streams) == 1 else heapq.merge(*streams, key=lambda item: item[:2])
+        names = self.names
+        for _, index, match in merged:
+            yield names[index], match
+
+    def findall(self, text):
+        """Returns {name: what re.findall(pattern, text) returns} for every pattern."""
+        found = {name: [] for name in self.names}
+        for name, match in self.finditer(text):
+            found[name].append(findall_value(match))
+        return found
+
+    def search(self, text):
+        """Returns the first (name, match) in the text, or None."""
+        return next(self.finditer(text), None)
+
+    def matching_names(self, text):
+        """Returns the set of names whose pattern matches somewhere in `text`."""
+        return {name for name, _ in self.finditer(text)}
@@ -0,0 +1,110 @@
+import multiprocessing
+import os
+import time
+
+from regex_multi import MultiPattern
+
+# --- Regex extraction on every core ---
+# Matching is pure CPU work in the interpreter and holds the GIL, so threads
+# don't make a findall() job any faster. extract() spreads the documents over
+# a process pool instead:
+#
+#   * the patterns go to each worker once, in the pool initializer, and are
+#     combined into one MultiPattern there; a document is scanned once for
+#     all of them.
+#   * documents are handed out `chunksize` at a time, so the pipe to the
+#     workers carries a few large messages instead of one per document. With
+#     paths=True only the file names travel; each worker reads its own files.
+#   * results come back as (index, {name: findall() result}) pairs, in input
+#     order (ordered=True) or as soon as a chunk is done (ordered=False).
+#
+#   for index, found in extract(EXTRACTION_PATTERNS, paths, paths=True, processes=32):
+#       ...
+#
+# Each result crosses a pipe as a pickle, so the gain is best when documents
+# are large compared to what is extracted from them. processes=1 runs in the
+# calling process, without a pool.
+
+EXTRACTION_PATTERNS = {
+    "email": r"[\w.+-]+@[\w-]+(?:\.[\w-]+)+",
+    "url": r"https?://[^\s<>\"']+",
+    "phone": r"\b\d{3}[-.\s]\d{3}[-.\s]\d{4}\b",
+}
+DEFAULT_CHUNKSIZE = 64 # Documents per message to a worker
+
+
+def _named(patterns):
+    # A list of patterns is named by position
+    return patterns if isinstance(patterns, dict) else dict(enumerate(patterns))
+
+
+def _read(path, encoding):
+    with open(path, encoding=encoding, errors="replace") as f:
+        return f.read()
+
+
+_worker_matcher = None
+_worker_encoding = None # Set when the documents are file paths
+
+
+def _init_worker(patterns, encoding):
+    global _worker_matcher, _worker_encoding
+    _worker_matcher = MultiPattern(patterns)
+    _worker_encoding = encoding
+
+
+def _extract_one(item):
+    index, document = item
+    if _worker_encoding is not None:
+        document = _read(document, _worker_encoding)
+    return index, _worker_matcher.findall(document)
+
+
+def extract(patterns, documents, processes=None, chunksize=DEFAULT_CHUNKSIZE, ordered=True,
+            paths=False, encoding="utf-8", context=None):
+    """Yields (index, {name: what re.findall() returns}) for every document.
+
+    `patterns` is a list of patterns (named 0, 1, ...) or a dict like
+    MultiPattern takes; compiled patterns are fine. `documents` is any
+    iterable of strings, or of file paths with paths=True. `index` is the
+    document's position in `documents`.
+    """
+    patterns = _named(patterns)
+    items = enumerate(documents)
+    if processes == 1:
+        matcher = MultiPattern(patterns)
+        for index, document in items:
+            yield index, matcher.findall(_read(document, encoding) if paths else document)
+        return
+    context = context or multiprocessing.get_context()
+    with context.Pool(processes, initializer=_init_worker,
+                      initargs=(patterns, encoding if paths else None)) as pool:
+        if ordered:
+            yield from pool.imap(_extract_one, items, chunksize)
+        else:
+            yield from pool.imap_unordered(_extract_one, items, chunksize)
+
+
+def extract_all(patterns, documents, **options):
+    """extract() collected into a list of result dicts, in input order."""
+    results = dict(extract(patterns, documents, **options))
+    return [results[index] for index in range(len(results))]
+
+
+def scaling_curve(patterns, documents, max_processes=None, **options):
+    """Times extract() over `documents` with 1, 2, 4, ... up to `max_processes` processes.
+
+    Returns [(processes, seconds, speedup over 1 process)]. Pool start-up is
+    part of the time, as it would be for a real job.
+    """
+    documents = list(documents)
+    max_processes = max_processes or os.cpu_count() or 1
+    counts = sorted({1, max_processes} | {2 ** n for n in range(1, max_processes.bit_length())})
+    curve = []
+    for processes in counts:
+        started = time.perf_counter()
+        for _ in extract(patterns, documents, processes=processes, **options):
+            pass
+        seconds = time.perf_counter() - started
+        curve.append((processes, seconds, curve[0][1] / seconds if curve else 1.0))
+    return curve
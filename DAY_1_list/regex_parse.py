@@ -0,0 +1,29 @@
+import re
+
+try:
+    from re import _compiler as sre_compile, _parser as sre_parse # Python 3.11+
+except ImportError:
+    import sre_compile
+    import sre_parse
+
+# --- re's parser, shared ---
+# regex_lint, regex_prefilter, regex_multi, regex_vectorized and regex_sub all
+# read the tree re's own parser builds for a pattern. The parser is internal
+# and moved in Python 3.11 (sre_parse became re._parser); it is imported here
+# once, along with the node types whose presence depends on the version.
+
+POSSESSIVE_REPEAT = getattr(sre_parse, "POSSESSIVE_REPEAT", None) # a*+, Python 3.11+
+ATOMIC_GROUP = getattr(sre_parse, "ATOMIC_GROUP", None)           # (?>...), Python 3.11+
+REPEATS = {sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT, POSSESSIVE_REPEAT}
+
+
+def parse(pattern, flags=0):
+    """The parsed tree of `pattern` (a source string), or None if the parser rejects it.
+
+    Callers pass the source of a pattern that already compiled, so None means
+    this Python's parser disagrees with its compiler, not a bad pattern.
+    """
+    try:
+        return sre_parse.parse(pattern, flags)
+    except (re.error, ValueError):
+        return None
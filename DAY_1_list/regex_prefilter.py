@@ -0,0 +1,151 @@
+import re
+
+from regex_cache import get_pattern
+from regex_parse import ATOMIC_GROUP, REPEATS, parse, sre_parse
+
+# --- Literal prefilter ---
+# Most patterns can only match text that contains some fixed substring:
+# r"Name: (\w+)" needs "Name: ", r"(\w+)@(\w+\.\w+)" needs "@" and ".".
+# str.find()/`in` looks for a substring much faster than the regex engine
+# walks the text, and when fewer than 1% of lines match, skipping the other
+# 99% before the regex runs is most of the work saved.
+#
+# required_literals() reads the parsed pattern and returns literals of which
+# at least one occurs in every text the pattern can match. Only parts every
+# match must go through count: repeats with a minimum of 0, optional groups
+# and assertions are skipped, and each branch of an alternation contributes
+# one literal. Case-insensitive parts have no literals.
+
+
+def _best(groups):
+    # The most selective "one of these" group: longest shortest literal, then fewest literals
+    return max(groups, key=lambda group: (min(len(literal) for literal in group), -len(group)))
+
+
+def _requirements(sequence):
+    """List of literal groups (tuples of code point tuples); every match contains
+    at least one literal of each group."""
+    groups = []
+    run = []
+    for op, av in sequence:
+        if op is sre_parse.LITERAL:
+            run.append(av)
+            continue
+        if op in (sre_parse.AT, sre_parse.ASSERT, sre_parse.ASSERT_NOT):
+            continue # Zero width: the literals on both sides are still adjacent
+        if run:
+            groups.append((tuple(run),))
+            run = []
+        if op is sre_parse.SUBPATTERN:
+            _, add_flags, _, subpattern = av
+            if not add_flags & re.IGNORECASE:
+                groups.extend(_requirements(subpattern))
+        elif op in REPEATS:
+            if av[0] >= 1:
+                groups.extend(_requirements(av[2]))
+        elif op is sre_parse.BRANCH:
+            alternatives = set()
+            for branch in av[1]:
+                branch_groups = _requirements(branch)
+                if not branch_groups:
+                    break # This branch needs no literal, so the alternation doesn't either
+                alternatives.update(_best(branch_groups))
+            else:
+                groups.append(tuple(sorted(alternatives)))
+        elif op is ATOMIC_GROUP:
+            groups.extend(_requirements(av))
+    if run:
+        groups.append((tuple(run),))
+    return groups
+
+
+def required_literals(pattern, flags=0):
+    """Returns literals of which at least one appears in any text `pattern` matches.
+
+    An empty tuple means the pattern has no such literal (every text must be tried).
+    """
+    compiled = get_pattern(pattern, flags)
+    if compiled.flags & (re.IGNORECASE | re.LOCALE):
+        return ()
+    parsed = parse(compiled.pattern, compiled.flags)
+    if parsed is None:
+        return ()
+    groups = _requirements(parsed)
+    if not groups:
+        return ()
+    if isinstance(compiled.pattern, bytes):
+        return tuple(bytes(literal) for literal in _best(groups))
+    return tuple("".join(map(chr, literal)) for literal in _best(groups))
+
+
+class LiteralSet:
+    """Finds which of many literals occur in a text, in one regex pass."""
+
+    def __init__(self, literals):
+        literals = sorted(set(literals), key=len, reverse=True)
+        self.literals = literals
+        if not literals:
+            self._any = self._finder = None
+            return
+        if isinstance(literals[0], bytes):
+            alternation = b"|".join(map(re.escape, literals))
+            finder = b"(?=(" + alternation + b"))"
+        else:
+            alternation = "|".join(map(re.escape, literals))
+            finder = "(?=(" + alternation + "))"
+        # Longest first, so at each position the longest literal is reported; the
+        # other literals starting there are its prefixes
+        self._any = re.compile(alternation)
+        self._finder = re.compile(finder)
+        self._prefixes = {
+            literal: [other for other in literals if literal.startswith(other)] for literal in literals
+        }
+
+    def any_in(self, text):
+        return self._any is not None and self._any.search(text) is not None
+
+    def present(self, text):
+        """Returns the set of literals that occur in `text`."""
+        found = set()
+        if not self.any_in(text): # Cheap check first; most texts contain none
+            return found
+        for match in self._finder.finditer(text):
+            found.update(self._prefixes[match.group(1)])
+        return found
+
+
+class PrefilteredPattern:
+    """A compiled pattern that skips texts missing its required literals."""
+
+    def __init__(self, pattern, flags=0):
+        self.regex = get_pattern(pattern, flags)
+        self.literals = required_literals(self.regex)
+        self.skipped = 0 # Texts rejected without running the regex
+
+    def may_match(self, text):
+        if not self.literals:
+            return True
+        for literal in self.literals:
+            if literal in text:
+                return True
+        self.skipped += 1
+        return False
+
+    def search(self, text):
+        return self.regex.search(text) if self.may_match(text) else None
+
+    def findall(self, text):
+        return self.regex.findall(text) if self.may_match(text) else []
+
+    def finditer(self, text):
+        return self.regex.finditer(text) if self.may_match(text) else iter(())
+
+
+def grep(pattern, lines, flags=0):
+    """Yields (line number, line, match) for every line `pattern` matches, from 1."""
+    prefiltered = pattern if isinstance(pattern, PrefilteredPattern) else PrefilteredPattern(pattern, flags)
+    search = prefiltered.search
+    for number, line in enumerate(lines, 1):
+        match = search(line)
+        if match is not None:
+            yield number, line, match
@@ -0,0 +1,198 @@
+import mmap
+import os
+
+from regex_cache import get_pattern
+from regex_multi import findall_value
+
+# --- Regex over files of any size ---
+# re needs the whole text in one buffer. For a multi-GB file there are two
+# ways around reading it all into memory:
+#
+#   * bytes patterns on a regular file: the file is memory-mapped and the
+#     regex runs over the mapping. The OS pages the file in as the scan goes;
+#     match offsets are file offsets as they are.
+#   * everything else (str patterns, pipes, open file objects): the file is
+#     read in chunks. A match found near the end of the buffer might continue
+#     in the next chunk, so it is only reported once at least
+#     `max_match_length` characters follow its start (or the file ends).
+#     Positions closer than that to the end are unsettled too, matched or
+#     not (a match starting there may have failed only for lack of text), so
+#     the unsettled tail is searched again with the next chunk. The carried
+#     text also keeps `max_match_length` characters before the resume point,
+#     for lookbehinds, \b and ^.
+#
+# `max_match_length` must bound how far a match, lookarounds included,
+# reaches from where it starts. Matches come back as StreamMatch objects whose
+# offsets are absolute: bytes for bytes patterns, characters of the decoded
+# text for str patterns.
+
+DEFAULT_CHUNK_SIZE = 1024 * 1024       # characters/bytes read per round
+DEFAULT_MAX_MATCH_LENGTH = 64 * 1024
+
+
+class StreamMatch:
+    """A match from a chunk, with start()/end()/span() relative to the whole file."""
+
+    __slots__ = ("match", "offset")
+
+    def __init__(self, match, offset):
+        self.match = match
+        self.offset = offset # absolute position of the chunk's first character
+
+    @property
+    def re(self):
+        return self.match.re
+
+    @property
+    def lastindex(self):
+        return self.match.lastindex
+
+    @property
+    def lastgroup(self):
+        return self.match.lastgroup
+
+    def group(self, *groups):
+        return self.match.group(*groups)
+
+    def __getitem__(self, group):
+        return self.match[group]
+
+    def groups(self, default=None):
+        return self.match.groups(default)
+
+    def groupdict(self, default=None):
+        return self.match.groupdict(default)
+
+    def expand(self, template):
+        return self.match.expand(template)
+
+    def start(self, group=0):
+        start = self.match.start(group)
+        return start if start < 0 else start + self.offset
+
+    def end(self, group=0):
+        end = self.match.end(group)
+        return end if end < 0 else end + self.offset
+
+    def span(self, group=0):
+        return self.start(group), self.end(group)
+
+    def __repr__(self):
+        return f"<StreamMatch span={self.span()!r}, match={self.group()!r}>"
+
+
+def _mmap_events(regex, path, with_text):
+    # (text before the match, match) pairs, then (rest of the file, None)
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0: # Can't map an empty file
+            for match in regex.finditer(b""):
+                yield b"", match
+            yield b"", None
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            last = 0
+            for match in regex.finditer(mapped):
+                yield (mapped[last:match.start()] if with_text else None), match
+                last = match.end()
+            yield (mapped[last:] if with_text else None), None
+
+
+def _chunk_events(regex, stream, chunk_size, max_match_length, with_text):
+    # Same pairs as _mmap_events(), from a stream read `chunk_size` at a time.
+    # Text between matches may come in several (text, None) pieces.
+    buffer = stream.read(0) # "" or b""
+    offset = 0             # absolute position of buffer[0]
+    pos = 0                # where the next search starts in buffer
+    text_start = 0         # start of the not yet reported text in buffer
+    empty_at = None        # absolute offset of the last empty match reported
+    while True:
+        chunk = stream.read(chunk_size)
+        at_eof = not chunk
+        buffer += chunk
+        resume = None
+        for match in regex.finditer(buffer, pos):
+            start, end = match.span()
+            if not at_eof and (end >= len(buffer) or start + max_match_length > len(buffer)):
+                resume = start # Might still grow or change with more data
+                break
+            if start == end:
+                if offset + start == empty_at:
+                    continue # Reported last round; finditer() goes on as it did then
+                empty_at = offset + start
+            yield (buffer[text_start:start] if with_text else None), StreamMatch(match, offset)
+            text_start = end
+        if at_eof:
+            yield (buffer[text_start:] if with_text else None), None
+            return
+        unsettled = max(text_start, len(buffer) - max_match_length)
+        resume = unsettled if resume is None else min(resume, unsettled)
+        if with_text and resume > text_start:
+            yield buffer[text_start:resume], None
+            text_start = resume
+        # Keep the unsettled tail, plus some text before it for lookbehinds
+        keep_from = max(0, min(text_start, resume - max_match_length))
+        buffer = buffer[keep_from:]
+        offset += keep_from
+        pos = resume - keep_from
+        text_start -= keep_from
+
+
+def _events(pattern, source, flags, encoding, chunk_size, max_match_length, use_mmap, with_text):
+    regex = get_pattern(pattern, flags)
+    binary = isinstance(regex.pattern, bytes)
+    if hasattr(source, "read"):
+        yield from _chunk_events(regex, source, chunk_size, max_match_length, with_text)
+    elif binary and use_mmap:
+        yield from _mmap_events(regex, source, with_text)
+    else:
+        mode = {"mode": "rb"} if binary else {"mode": "r", "encoding": encoding, "newline": ""}
+        with open(source, **mode) as stream:
+            yield from _chunk_events(regex, stream, chunk_size, max_match_length, with_text)
+
+
+def finditer_file(pattern, source, flags=0, encoding="utf-8", chunk_size=DEFAULT_CHUNK_SIZE,
+                  max_match_length=DEFAULT_MAX_MATCH_LENGTH, use_mmap=True):
+    """Like re.finditer() over the contents of `source` (a path or an open file).
+
+    Memory-mapped matches read from the mapping, so use them (or copy out
+    group() values) before the iteration finishes.
+    """
+    for _, match in _events(pattern, source, flags, encoding, chunk_size, max_match_length, use_mmap, False):
+        if match is not None:
+            yield match
+
+
+def findall_file(pattern, source, flags=0, **options):
+    """Yields what re.findall() would return for the contents of `source`, one item at a time."""
+    for match in finditer_file(pattern, source, flags, **options):
+        yield findall_value(match)
+
+
+def sub_file(pattern, repl, source, destination, count=0, flags=0, encoding="utf-8",
+             chunk_size=DEFAULT_CHUNK_SIZE, max_match_length=DEFAULT_MAX_MATCH_LENGTH, use_mmap=True):
+    """re.sub() from `source` into `destination` (paths or open files). Returns the number of replacements.
+
+    `repl` is a template string (group references allowed) or a function of the match.
+    """
+    binary = isinstance(get_pattern(pattern, flags).pattern, bytes)
+    replace = repl if callable(repl) else (lambda match: match.expand(repl))
+    replaced = 0
+    output = destination
+    if not hasattr(destination, "write"):
+        mode = {"mode": "wb"} if binary else {"mode": "w", "encoding": encoding, "newline": ""}
+        output = open(destination, **mode)
+    try:
+        events = _events(pattern, source, flags, encoding, chunk_size, max_match_length, use_mmap, True)
+        for text, match in events:
+            output.write(text)
+            if match is None:
+                continue
+            if count and replaced >= count:
+                output.write(match.group())
+            else:
+                output.write(replace(match))
+                replaced += 1
+    finally:
+        if output is not destination:
+            output.close()
+    return replaced
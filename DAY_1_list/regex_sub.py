@@ -0,0 +1,201 @@
+import _sre
+import functools
+import re
+
+from regex_cache import get_pattern
+from regex_multi import _alternative, _uses_group_numbers
+from regex_parse import sre_compile, sre_parse
+
+# --- Substitution without a Python call per match ---
+# re.sub() with a template that has group references (r"\2-\1") expands it
+# for every match in Python (before 3.12), and a replacement function is a
+# Python call per match by definition. Both add up on large texts.
+#
+# Substitution parses the template once into literal text and group numbers.
+# The replacement is then done in C loops only:
+#   * pattern.split() returns the text between matches with the groups of
+#     each match interleaved: [text, g1, g2, text, g1, g2, text]
+#   * the template becomes a %-format string ("%s-%s"), applied to every
+#     match's groups with map()
+#   * text and expansions are put back together with one join()
+# A template without group references is a constant and is left to re, which
+# inserts it without calling back into Python.
+#
+# Replacer does a dict of literal replacements, {"colour": "color", ...}, in
+# one pass over the text. The keys are combined into one regex with their
+# common prefixes factored out (a trie: colo(?:ur|r)...), so the regex engine
+# doesn't try every key at every position, and the replacement is looked up
+# with dict.__getitem__ through map(). Unlike N str.replace() calls in a
+# row, a replacement is never matched again by a later key.
+
+_empty = {str: "", bytes: b""}
+
+
+def _parse_template(template, regex):
+    # The template as a list of literal strings and group numbers. A bad group
+    # reference raises here, as it would from re.sub()
+    parsed = sre_parse.parse_template(template, regex)
+    if isinstance(parsed, tuple): # Python < 3.12: ([(index, group), ...], literals with None at those indexes)
+        groups, literals = parsed
+        items = list(literals)
+        for index, group in groups:
+            items[index] = group
+    else: # Python 3.12+: literal, group, literal, ..., literal
+        items = parsed
+    return [item for item in items if item is not None and item != "" and item != b""]
+
+
+class Substitution:
+    """A pattern and a replacement template, both compiled once.
+
+    sub()/subn() give the same results as re.sub()/re.subn().
+    """
+
+    def __init__(self, pattern, template, flags=0):
+        self.regex = get_pattern(pattern, flags)
+        self.template = template
+        self._format = None   # %-format string for the groups of each match
+        self._repl = template # what re gets when the format isn't used
+        items = _parse_template(template, self.regex)
+        binary = isinstance(template, bytes)
+        groups = [item for item in items if isinstance(item, int)]
+        if not groups:
+            # A constant: escape it so re takes it as it is, with no per-match call
+            literal = (b"" if binary else "").join(items)
+            self._repl = literal.replace(b"\\", b"\\\\") if binary else literal.replace("\\", "\\\\")
+            return
+        self._splitter = self.regex
+        if 0 in groups:
+            # split() doesn't return the whole match, so it gets a group of its own
+            if not isinstance(self.regex.pattern, str) or _uses_group_numbers(self.regex.pattern):
+                return
+            self._splitter = re.compile(f"({_alternative(self.regex)})")
+            groups = [group + 1 for group in groups]
+        self._groups = groups
+        self._stride = self._splitter.groups + 1
+        if binary:
+            self._format = b"".join(b"%s" if isinstance(item, int) else item.replace(b"%", b"%%") for item in items)
+        else:
+            self._format = "".join("%s" if isinstance(item, int) else item.replace("%", "%%") for item in items)
+
+    def _column(self, parts, group):
+        # Value of `group` for every match; groups that didn't take part are empty
+        column = parts[group::self._stride]
+        if None in column:
+            empty = _empty[type(self._format)]
+            column = [empty if value is None else value for value in column]
+        return column
+
+    def subn(self, string, count=0):
+        if self._format is None:
+            return self.regex.subn(self._repl, string, count)
+        parts = self._splitter.split(string, count)
+        matches = len(parts) // self._stride
+        if not matches:
+            return string, 0
+        columns = [self._column(parts, group) for group in self._groups]
+        pieces = [None] * (2 * matches + 1)
+        pieces[0::2] = parts[0::self._stride]
+        pieces[1::2] = map(self._format.__mod__, zip(*columns))
+        return string[:0].join(pieces), matches
+
+    def sub(self, string, count=0):
+        return self.subn(string, count)[0]
+
+
+@functools.lru_cache(maxsize=1024)
+def _substitution(pattern, template, flags):
+    return Substitution(pattern, template, flags)
+
+
+def subn(pattern, repl, string, count=0, flags=0):
+    """re.subn() through a cached Substitution when `repl` is a template."""
+    if callable(repl):
+        return get_pattern(pattern, flags).subn(repl, string, count)
+    return _substitution(pattern, repl, flags).subn(string, count)
+
+
+def sub(pattern, repl, string, count=0, flags=0):
+    """re.sub() through a cached Substitution when `repl` is a template."""
+    return subn(pattern, repl, string, count, flags)[0]
+
+
+# --- Many literal replacements in one pass ---
+
+# re.IGNORECASE compares str text one character at a time: the simple
+# lowercase of each, where some lowercase letters also stand for others
+# (s and ſ, σ and ς, ...). _fold() maps text to the same key for every
+# spelling re.I treats as equal.
+_CASE_EQUIVALENTS = getattr(sre_compile, "_EXTRA_CASES", None) or getattr(sre_compile, "_ignorecase_fixes", {})
+_FOLD_TABLE = {code: min(code, *others) for code, others in _CASE_EQUIVALENTS.items()}
+
+
+@functools.lru_cache(maxsize=4096)
+def _fold(text):
+    codes = map(_sre.unicode_tolower, map(ord, text))
+    return "".join([chr(_FOLD_TABLE.get(code, code)) for code in codes])
+
+
+def _trie_source(words):
+    # Alternation of `words` with common prefixes factored out. Where a word
+    # ends inside a longer one, the longer continuation is tried first.
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[None] = {} # End of a word
+
+    def walk(node):
+        branches = [re.escape(char) + walk(child) for char, child in sorted(
+            (char, child) for char, child in node.items() if char is not None)]
+        if not branches:
+            return ""
+        if len(branches) == 1 and (None not in node or len(branches[0]) == 1):
+            body = branches[0]
+        else:
+            body = f"(?:{'|'.join(branches)})"
+        return body + "?" if None in node else body
+
+    return walk(trie)
+
+
+class Replacer:
+    """Replaces every key of `replacements` with its value, in one pass over the text.
+
+    At each position the longest key wins. Keys and values are literal
+    strings (or all bytes). ignore_case compares keys the way re.IGNORECASE
+    does; whole_words only replaces keys with no word character right
+    before or after them.
+    """
+
+    def __init__(self, replacements, ignore_case=False, whole_words=False):
+        keys = [key for key in replacements if key]
+        if not keys:
+            raise ValueError("no replacements given")
+        binary = isinstance(keys[0], bytes)
+        self._fold = bytes.lower if binary else _fold # re.I on bytes is ASCII only
+        if ignore_case:
+            self._lookup = {self._fold(key): replacements[key] for key in keys}
+        else:
+            self._lookup = {key: replacements[key] for key in keys}
+        self.ignore_case = ignore_case
+        words = [key.decode("latin-1") for key in self._lookup] if binary else list(self._lookup)
+        source = _trie_source(words)
+        if whole_words:
+            # Not \b: a key can start or end with a non-word character ("c++")
+            source = rf"(?<!\w)(?:{source})(?!\w)"
+        source = f"({source})"
+        self.pattern = re.compile(source.encode("latin-1") if binary else source, re.I if ignore_case else 0)
+
+    def subn(self, text, count=0):
+        parts = self.pattern.split(text, count)
+        found = parts[1::2]
+        if self.ignore_case:
+            parts[1::2] = map(self._lookup.get, map(self._fold, found), found)
+        else:
+            parts[1::2] = map(self._lookup.__getitem__, found)
+        return text[:0].join(parts), len(found)
+
+    def sub(self, text, count=0):
+        return self.subn(text, count)[0]
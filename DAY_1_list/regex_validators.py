@@ -0,0 +1,145 @@
+import random
+import re
+
+from regex_multi import MultiPattern
+from regex_prefilter import PrefilteredPattern
+
+# --- Validators and extractors for common fields ---
+# Every inbound record goes through checks like "is this an email address".
+# Each check below is its regex's fullmatch(), compiled once and without
+# capture groups, behind a gate made of plain string operations (length,
+# separator positions) that rules out most wrong values before the regex
+# engine starts. The gate is a necessary condition of the regex, so the
+# answer is always exactly the regex's; fuzz() checks that on random strings.
+#
+# A character-by-character scanner written in Python is slower than the regex
+# engine on values that pass (the engine's loop is C), so only the cheap
+# rejections are done by hand.
+#
+# The patterns are ASCII only: [0-9] rather than \d, which also accepts
+# digits from other scripts. ISO dates are checked for shape (month 01-12,
+# day 01-31), not against the calendar.
+
+_OCTET = r"(?:25[0-5]|2[0-4][0-9]|1[0-9][0-9]|[1-9]?[0-9])"
+
+PATTERNS = {
+    "email": r"[A-Za-z0-9._%+-]+@(?:[A-Za-z0-9-]+\.)+[A-Za-z]{2,}",
+    "phone": r"(?:\([0-9]{3}\) ?|[0-9]{3}[-. ]?)[0-9]{3}[-. ]?[0-9]{4}",
+    "ipv4": rf"{_OCTET}(?:\.{_OCTET}){{3}}",
+    "iso_date": r"[0-9]{4}-(?:0[1-9]|1[0-2])-(?:0[1-9]|[12][0-9]|3[01])",
+    "uuid": r"[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}",
+}
+
+# What may not touch a value found inside a longer text, before and after it
+_BOUNDARIES = {
+    "email": (r"(?<![A-Za-z0-9._%+-])", r"(?![A-Za-z0-9-])"),
+    "phone": (r"(?<![0-9])", r"(?![0-9])"),
+    "ipv4": (r"(?<![0-9.])", r"(?!\.?[0-9])"),
+    "iso_date": (r"(?<![0-9])", r"(?![0-9])"),
+    "uuid": (r"(?<![0-9A-Fa-f-])", r"(?![0-9A-Fa-f-])"),
+}
+
+_fullmatch = {kind: re.compile(pattern).fullmatch for kind, pattern in PATTERNS.items()}
+_email = _fullmatch["email"]
+_phone = _fullmatch["phone"]
+_ipv4 = _fullmatch["ipv4"]
+_iso_date = _fullmatch["iso_date"]
+_uuid = _fullmatch["uuid"]
+
+
+def is_email(text):
+    return len(text) >= 6 and "@" in text and _email(text) is not None # a@b.co
+
+
+def is_phone(text):
+    return 10 <= len(text) <= 14 and _phone(text) is not None # 1234567890 .. (123) 456-7890
+
+
+def is_ipv4(text):
+    return 7 <= len(text) <= 15 and _ipv4(text) is not None
+
+
+def is_iso_date(text):
+    return len(text) == 10 and text[4] == "-" and text[7] == "-" and _iso_date(text) is not None
+
+
+def is_uuid(text):
+    return len(text) == 36 and text[8] == "-" and text[23] == "-" and _uuid(text) is not None
+
+
+VALIDATORS = {
+    "email": is_email,
+    "phone": is_phone,
+    "ipv4": is_ipv4,
+    "iso_date": is_iso_date,
+    "uuid": is_uuid,
+}
+
+
+def validate(kind, text):
+    """True if the whole of `text` is a value of `kind` ("email", "phone", ...)."""
+    return VALIDATORS[kind](text)
+
+
+_finders = {
+    kind: PrefilteredPattern(before + PATTERNS[kind] + after)
+    for kind, (before, after) in _BOUNDARIES.items()
+}
+_all_finders = MultiPattern({kind: finder.regex for kind, finder in _finders.items()})
+
+
+def extract(kind, text):
+    """List of the `kind` values that appear in `text`."""
+    return [match.group() for match in _finders[kind].finditer(text)]
+
+
+def extract_all(text):
+    """{kind: list of values} for every kind, from one scan of `text`."""
+    return _all_finders.findall(text)
+
+
+# --- Equivalence check ---
+
+_SAMPLES = {
+    "email": ["user.name+tag@mail.example.com", "a@b.co", "x_1%y@sub-domain.example.org"],
+    "phone": ["123-456-7890", "(123) 456-7890", "123.456.7890", "1234567890", "(123)456 7890"],
+    "ipv4": ["192.168.1.254", "0.0.0.0", "255.255.255.255", "10.20.199.249"],
+    "iso_date": ["2024-02-29", "1999-12-31", "2000-01-01", "2023-10-30"],
+    "uuid": ["123e4567-e89b-12d3-a456-426614174000", "ABCDEF01-2345-6789-abcd-ef0123456789"],
+}
+_FUZZ_CHARS = "0123456789abcfzAFZ@.-_%+() :/\n١é"
+
+
+def _mutate(text, rng):
+    # A near miss: a few characters inserted, deleted or replaced
+    chars = list(text)
+    for _ in range(rng.randint(1, 3)):
+        position = rng.randint(0, len(chars))
+        action = rng.random()
+        if action < 0.4 or not chars:
+            chars.insert(position, rng.choice(_FUZZ_CHARS))
+        elif action < 0.7:
+            del chars[min(position, len(chars) - 1)]
+        else:
+            chars[min(position, len(chars) - 1)] = rng.choice(_FUZZ_CHARS)
+    return "".join(chars)
+
+
+def fuzz(kind, trials=10000, seed=0):
+    """Returns the strings on which validate(kind, ...) and the plain regex disagree.
+
+    Tries valid samples, near misses of them and random strings.
+    """
+    rng = random.Random(seed)
+    regex = re.compile(PATTERNS[kind])
+    validator = VALIDATORS[kind]
+    mismatches = []
+    for trial in range(trials):
+        text = rng.choice(_SAMPLES[kind])
+        if trial % 3:
+            text = _mutate(text, rng)
+        if trial % 10 == 9:
+            text = "".join(rng.choice(_FUZZ_CHARS) for _ in range(rng.randint(0, 40)))
+        if validator(text) != (regex.fullmatch(text) is not None):
+            mismatches.append(text)
+    return mismatches
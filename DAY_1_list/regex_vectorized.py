@@ -0,0 +1,264 @@
+import bisect
+import itertools
+import re
+
+import numpy as np
+import pandas as pd
+
+from regex_cache import get_pattern
+from regex_parse import ATOMIC_GROUP, REPEATS, parse, sre_parse
+from regex_prefilter import required_literals
+
+# --- Regex over whole columns ---
+# Series.str.contains() / .str.replace() call the regex once per row, through
+# a Python function that also checks every value for NaN. With millions of
+# short strings that per-row overhead costs more than the matching does.
+#
+# Here the values that are not strings (nulls, numbers, ...) are set aside
+# first; like pandas, they get NaN (or `na`). Only the strings go on. They are joined into one string with "\x00" between rows, and the
+# work is done over the joined text, with match positions mapped back to rows
+# through the row start offsets:
+#
+#   * a pattern with required literals (regex_prefilter) looks for those in
+#     the joined text first; the regex then runs only on the rows that
+#     contain one. Usually that is a small part of the column.
+#   * otherwise the regex itself runs over the joined text: sub() is a single
+#     call for the whole batch, contains() and extract() need one search per
+#     matching row.
+#
+# The second way gives the per-row answer only if no match can reach across
+# a "\x00": the pattern must not be able to match it ('.', \W, [^...], ...)
+# or care where a string starts or ends (^, $, \A, \Z). Such patterns, and
+# batches whose values contain "\x00" themselves, use a loop over the
+# non-null values.
+#
+#   mask = contains(r"\bERR-\d{3}\b", df["message"])
+#   codes = extract(r"ERR-(?P<code>\d{3})", df["message"])
+#   df["message"] = sub(r"\s+", " ", df["message"])
+
+DEFAULT_BATCH_SIZE = 1_000_000 # Rows per joined string
+
+_SAFE_AT = {sre_parse.AT_BOUNDARY}
+_SAFE_CATEGORIES = {sre_parse.CATEGORY_DIGIT, sre_parse.CATEGORY_WORD, sre_parse.CATEGORY_SPACE}
+
+
+def _class_excludes_separator(items):
+    for op, av in items:
+        if op is sre_parse.LITERAL:
+            safe = av != 0
+        elif op is sre_parse.RANGE:
+            safe = av[0] > 0
+        elif op is sre_parse.CATEGORY:
+            safe = av in _SAFE_CATEGORIES
+        else:
+            return False # NEGATE, ...
+        if not safe:
+            return False
+    return True
+
+
+def _stays_in_row(sequence):
+    # True if nothing in the parsed pattern can match "\x00" or tell a row
+    # boundary from the start or end of a string
+    for op, av in sequence:
+        if op is sre_parse.LITERAL:
+            safe = av != 0
+        elif op is sre_parse.IN:
+            safe = _class_excludes_separator(av)
+        elif op is sre_parse.AT:
+            # \b sees "\x00" like the end of a string. \B doesn't: it never
+            # matches an empty string, but does between two separators
+            safe = av in _SAFE_AT
+        elif op is sre_parse.SUBPATTERN:
+            safe = _stays_in_row(av[3])
+        elif op in (sre_parse.ASSERT, sre_parse.ASSERT_NOT):
+            safe = _stays_in_row(av[1])
+        elif op is sre_parse.BRANCH:
+            safe = all(_stays_in_row(branch) for branch in av[1])
+        elif op in REPEATS:
+            safe = _stays_in_row(av[2])
+        elif op is ATOMIC_GROUP:
+            safe = _stays_in_row(av)
+        elif op is sre_parse.GROUPREF:
+            safe = True # The group itself can't have captured "\x00"
+        elif op is sre_parse.GROUPREF_EXISTS:
+            _, yes, no = av
+            safe = _stays_in_row(yes) and (no is None or _stays_in_row(no))
+        else:
+            return False
+        if not safe:
+            return False
+    return True
+
+
+def _joinable(regex):
+    parsed = parse(regex.pattern, regex.flags)
+    return parsed is not None and _stays_in_row(parsed)
+
+
+def _separator(regex):
+    return "\x00" if isinstance(regex.pattern, str) else b"\x00"
+
+
+def _join(batch, separator):
+    # The batch as one string, or None when a value contains the separator
+    joined = separator.join(batch)
+    return joined if joined.count(separator) == len(batch) - 1 else None
+
+
+def _row_starts(batch):
+    lengths = np.fromiter(map(len, batch), dtype=np.int64, count=len(batch))
+    starts = np.zeros(len(batch), dtype=np.int64)
+    np.cumsum(lengths[:-1] + 1, out=starts[1:])
+    return starts.tolist()
+
+
+def _first_matches(regex, joined, starts):
+    # (row, first match in that row) for every row with a match
+    search = regex.search
+    last_row = len(starts) - 1
+    pos = 0
+    while True:
+        match = search(joined, pos)
+        if match is None:
+            return
+        row = bisect.bisect_right(starts, match.start()) - 1
+        yield row, match
+        if row == last_row:
+            return
+        pos = starts[row + 1] # The rest of this row doesn't matter
+
+
+def _literal_finder(regex, separator):
+    # Regex finding any of the pattern's required literals, or None
+    literals = required_literals(regex)
+    if not literals or any(separator in literal for literal in literals):
+        return None
+    return re.compile(("|" if isinstance(separator, str) else b"|").join(map(re.escape, literals)))
+
+
+def _candidate_rows(finder, batch, joined):
+    # Rows of the batch that contain one of the literals
+    return [row for row, _ in _first_matches(finder, joined, _row_starts(batch))]
+
+
+def _row_matches(regex, valid, batch_size):
+    """(position in `valid`, first match) for every value the pattern matches.
+
+    A match may be one over a joined batch; only its groups are meaningful.
+    """
+    separator = _separator(regex)
+    finder = _literal_finder(regex, separator)
+    joinable = finder is not None or _joinable(regex)
+    search = regex.search
+    for offset in range(0, len(valid), batch_size):
+        batch = valid[offset:offset + batch_size]
+        joined = _join(batch, separator) if joinable else None
+        if joined is None:
+            matches = ((row, match) for row, value in enumerate(batch) if (match := search(value)) is not None)
+        elif finder is not None:
+            rows = _candidate_rows(finder, batch, joined)
+            matches = ((row, match) for row in rows if (match := search(batch[row])) is not None)
+        else:
+            matches = _first_matches(regex, joined, _row_starts(batch))
+        for row, match in matches:
+            yield offset + row, match
+
+
+def _split_strings(values, regex):
+    # (object array of the values, positions of those the pattern can search:
+    # str, or bytes for a bytes pattern)
+    array = np.asarray(values, dtype=object)
+    kind = type(regex.pattern)
+    is_text = np.fromiter(map(isinstance, array, itertools.repeat(kind)), dtype=bool, count=len(array))
+    return array, np.flatnonzero(is_text)
+
+
+def contains(pattern, values, flags=0, na=False, batch_size=DEFAULT_BATCH_SIZE):
+    """Boolean mask of the values `pattern` matches somewhere in, like Series.str.contains().
+
+    `values` is a Series or anything np.asarray() takes; a Series gives a
+    Series with the same index. Non-string values get `na`, as in pandas;
+    an `na` that isn't a bool (np.nan, None) gives an object array, and
+    with np.nan missing values keep their own None/NaN.
+    """
+    regex = get_pattern(pattern, flags)
+    array, valid_rows = _split_strings(values, regex)
+    found = np.zeros(len(valid_rows), dtype=bool)
+    found[[row for row, _ in _row_matches(regex, array[valid_rows], batch_size)]] = True
+    if isinstance(na, (bool, np.bool_)):
+        mask = np.full(len(array), na, dtype=bool)
+    else:
+        mask = np.full(len(array), na, dtype=object)
+        if na is not None and pd.isna(na):
+            missing = pd.isna(array)
+            mask[missing] = array[missing] # na=NaN leaves missing values as they are
+    mask[valid_rows] = found
+    if isinstance(values, pd.Series):
+        return pd.Series(mask, index=values.index, name=values.name)
+    return mask
+
+
+def extract(pattern, values, flags=0, batch_size=DEFAULT_BATCH_SIZE):
+    """DataFrame with one column per group of the first match, like Series.str.extract().
+
+    Named groups give the column names, other groups are numbered from 0.
+    Rows without a match and null or other non-string rows are NaN.
+    """
+    regex = get_pattern(pattern, flags)
+    if regex.groups == 0:
+        raise ValueError("pattern contains no capture groups")
+    array, valid_rows = _split_strings(values, regex)
+    rows, groups = [], []
+    for row, match in _row_matches(regex, array[valid_rows], batch_size):
+        rows.append(row)
+        groups.append(match.groups(np.nan))
+    columns = np.full((len(array), regex.groups), np.nan, dtype=object)
+    if rows:
+        columns[valid_rows[rows]] = groups
+    names = {number: name for name, number in regex.groupindex.items()}
+    series = isinstance(values, pd.Series)
+    return pd.DataFrame(
+        columns,
+        index=values.index if series else None,
+        columns=[names.get(number, number - 1) for number in range(1, regex.groups + 1)],
+        # A string-dtype Series gives string columns, anything else object ones
+        dtype=values.dtype if series and isinstance(values.dtype, pd.StringDtype) else object,
+    )
+
+
+def sub(pattern, repl, values, count=0, flags=0, batch_size=DEFAULT_BATCH_SIZE):
+    """re.sub() on every non-null value, like Series.str.replace(regex=True).
+
+    Returns the same kind of array (a Series keeps its index, name and
+    dtype); null values are left as they are and other non-string values
+    become NaN, as in pandas. Without required literals,
+    a template `repl` with count=0 runs once per batch over the joined rows.
+    """
+    regex = get_pattern(pattern, flags)
+    array, valid_rows = _split_strings(values, regex)
+    valid = array[valid_rows]
+    separator = _separator(regex)
+    finder = _literal_finder(regex, separator)
+    whole_batches = isinstance(repl, (str, bytes)) and not count and _joinable(regex)
+    replaced = []
+    for offset in range(0, len(valid), batch_size):
+        batch = valid[offset:offset + batch_size]
+        joined = _join(batch, separator) if finder is not None or whole_batches else None
+        new = None
+        if joined is not None and finder is not None:
+            new = list(batch) # Rows without the literals stay as they are
+            for row in _candidate_rows(finder, batch, joined):
+                new[row] = regex.sub(repl, batch[row], count)
+        elif joined is not None:
+            new = regex.sub(repl, joined).split(separator)
+            if len(new) != len(batch):
+                new = None # The template wrote a "\x00" of its own (e.g. \0)
+        if new is None:
+            new = [regex.sub(repl, value, count) for value in batch]
+        replaced.extend(new)
+    result = np.where(pd.isna(array), array, np.nan).astype(object)
+    result[valid_rows] = replaced
+    if isinstance(values, pd.Series):
+        return pd.Series(result, index=values.index, name=values.name, dtype=values.dtype)
+    return result
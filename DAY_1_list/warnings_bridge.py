@@ -0,0 +1,106 @@
+import atexit
+import linecache
+import logging
+import threading
+import warnings
+
+# --- Collapsing warnings bridge ---
+# logging.captureWarnings(True) formats every warning that reaches
+# warnings.showwarning(), source line lookup included, and logs it. With an
+# "always" filter a warning in a hot loop gets that treatment on every
+# iteration. This bridge logs the first warning from each
+# (category, filename, lineno) once, then only counts repeats. While installed,
+# a daemon thread logs one "repeated N times" line per location every
+# `flush_interval` seconds; uninstall() and interpreter exit log the rest.
+
+DEFAULT_FLUSH_INTERVAL = 60.0
+DEFAULT_MAX_LOCATIONS = 10000
+
+
+class WarningsBridge:
+    """Replacement for warnings.showwarning that logs each warning location once."""
+
+    def __init__(self, logger_name="py.warnings", flush_interval=DEFAULT_FLUSH_INTERVAL,
+                 max_locations=DEFAULT_MAX_LOCATIONS):
+        self.logger = logging.getLogger(logger_name)
+        self.flush_interval = flush_interval
+        self.max_locations = max_locations
+        self._seen = {} # (category, filename, lineno) -> repeats since the last flush
+        self._lock = threading.Lock()
+        self._original_showwarning = None
+        self._stop_flusher = None
+
+    def install(self):
+        if self._original_showwarning is None:
+            self._original_showwarning = warnings.showwarning
+            warnings.showwarning = self.showwarning
+            if self.flush_interval:
+                # Summarises repeats even when no further warning comes in
+                self._stop_flusher = threading.Event()
+                threading.Thread(target=self._flush_periodically, args=(self._stop_flusher,),
+                                 daemon=True, name="warnings-flusher").start()
+
+    def uninstall(self):
+        if self._original_showwarning is not None:
+            if self._stop_flusher is not None:
+                self._stop_flusher.set()
+                self._stop_flusher = None
+            self.flush()
+            warnings.showwarning = self._original_showwarning
+            self._original_showwarning = None
+
+    def showwarning(self, message, category, filename, lineno, file=None, line=None):
+        if file is not None:
+            # An explicit file means the caller wants it written there, as logging does
+            self._original_showwarning(message, category, filename, lineno, file, line)
+            return
+        key = (category, filename, lineno)
+        with self._lock:
+            repeats = self._seen.get(key)
+            if repeats is not None:
+                self._seen[key] = repeats + 1
+            elif len(self._seen) >= self.max_locations:
+                repeats = -1 # Too many locations to track; log without remembering
+            else:
+                self._seen[key] = 0
+        if repeats is None or repeats < 0:
+            # First time at this location: the only time the source line is read
+            if line is None:
+                line = linecache.getline(filename, lineno)
+            self.logger.warning("%s", warnings.formatwarning(message, category, filename, lineno, line))
+
+    def _flush_periodically(self, stop):
+        while not stop.wait(self.flush_interval):
+            self.flush()
+
+    def flush(self):
+        """Logs one summary line for every location that repeated since the last flush."""
+        with self._lock:
+            repeated = [(key, count) for key, count in self._seen.items() if count]
+            for key, _ in repeated:
+                self._seen[key] = 0
+        for (category, filename, lineno), count in repeated:
+            self.logger.warning("%s:%s: %s repeated %d times", filename, lineno, category.__name__, count)
+
+
+_bridge = None
+
+
+def capture_warnings(capture, **options):
+    """Like logging.captureWarnings(), but through a WarningsBridge(**options)."""
+    global _bridge
+    if capture:
+        if _bridge is None:
+            _bridge = WarningsBridge(**options)
+            _bridge.install()
+    elif _bridge is not None:
+        _bridge.uninstall()
+        _bridge = None
+
+
+def _flush_at_exit():
+    if _bridge is not None:
+        _bridge.flush()
+
+
+atexit.register(_flush_at_exit)